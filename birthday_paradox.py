@@ -9,32 +9,235 @@
 @copyright Copyright 2022 Evan Elias Young. All rights reserved.
 """
 
-from decimal import getcontext as setprec, Decimal
-from math import factorial as fct
+import argparse
+from decimal import Decimal
+from itertools import accumulate
+from math import expm1, inf, lgamma, log, log1p
+from typing import TYPE_CHECKING
 
+try:
+    import numpy as np
 
-def get_percent(ppl: int) -> Decimal:
+    HAS_NUMPY: bool = True
+except ImportError:
+    HAS_NUMPY = False
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+DAYS: int = 365
+SUM_MAX: int = 1000
+SERIES_MAX_RATIO: float = 1e-4
+STIRLING_MIN: int = 100
+SHORTFALL_SERIES_MAX: float = 0.25
+
+
+def _stirling(num: int) -> float:
+    """Will return the tail of Stirling's series for lgamma(num + 1).
+
+    Args:
+        num (integer): The number, at least STIRLING_MIN.
+
+    Returns:
+        float: lgamma(num + 1) less (num + 1/2) ln(num) - num + ln(2 pi) / 2.
+    """
+    inv: float = 1 / num
+    sqr: float = inv * inv
+    return inv * (1 / 12 - sqr * (1 / 360 - sqr * (1 / 1260 - sqr / 1680)))
+
+
+def _shortfall(ratio: float, share: float, lost: float) -> float:
+    """Will return ratio + (1 - ratio) log(1 - ratio) without cancellation.
+
+    Near zero its two terms nearly cancel, so small ratios instead sum its
+    series, ratio**k / (k (k - 1)) for k from 2.
+
+    Args:
+        ratio (float): The ratio, from 0 to 1.
+        share (float): 1 - ratio, computed exactly by the caller.
+        lost (float): -log(1 - ratio), computed exactly by the caller.
+
+    Returns:
+        float: The shortfall.
+    """
+    if ratio >= SHORTFALL_SERIES_MAX:
+        return ratio - share * lost
+    total: float = 0.0
+    power: float = ratio
+    k: int = 2
+    while True:
+        power *= ratio
+        term: float = power / (k * (k - 1))
+        total += term
+        if term <= total * 1e-17:
+            return total
+        k += 1
+
+
+def log_no_match(ppl: int, days: int = DAYS) -> float:
+    """Will calculate the log of the chance that nobody shares a day.
+
+    That chance is the product of 1 - k / days for k below ppl. Small
+    groups sum its logs directly. Groups tiny next to days use the power
+    sums of k in the series of log(1 - x), and everything else takes the
+    difference of Stirling's series for days! / (days - ppl)!, which,
+    unlike two lgamma calls, does not cancel away when days is huge. Its
+    leading terms are rearranged into days times a shortfall that is
+    itself free of cancellation, and the log of the remaining share is
+    taken from the exact integers once ppl / days rounds towards 1.
+
+    Args:
+        ppl (integer): The amount of people.
+        days (integer): The amount of days, or of any equally likely value.
+
+    Returns:
+        float: The natural log of the chance, -inf if a match is certain.
+    """
+    if ppl > days:
+        return -inf
+    if ppl <= 1:
+        return 0.0
+    if ppl <= SUM_MAX:
+        return sum(log1p(-k / days) for k in range(1, ppl))
+    if ppl < SERIES_MAX_RATIO * days:
+        top: int = ppl - 1
+        sum1: int = top * ppl // 2
+        sum2: int = top * ppl * (2 * top + 1) // 6
+        sum4: int = sum2 * (3 * top * top + 3 * top - 1) // 5
+        return -(
+            sum1 / days
+            + sum2 / (2 * days**2)
+            + sum1 * sum1 / (3 * days**3)
+            + sum4 / (4 * days**4)
+        )
+    rest: int = days - ppl
+    if rest < STIRLING_MIN:
+        return lgamma(days + 1) - lgamma(rest + 1) - ppl * log(days)
+    ratio: float = ppl / days
+    lost: float = -log1p(-ratio) if 2 * ppl < days else log(days / rest)
+    return (
+        -days * _shortfall(ratio, rest / days, lost)
+        + 0.5 * lost
+        + _stirling(days)
+        - _stirling(rest)
+    )
+
+
+def get_probability(ppl: int, days: int = DAYS) -> float:
+    """Will calculate the chance of a match, accurate even when it is tiny.
+
+    Args:
+        ppl (integer): The amount of people.
+        days (integer): The amount of days, or of any equally likely value.
+
+    Returns:
+        float: The chance of a match, from 0 to 1.
+    """
+    return -expm1(log_no_match(ppl, days))
+
+
+def get_percent(ppl: int, days: int = DAYS) -> Decimal:
     """Will calculate the percent chance of matching birthdays.
 
     Args:
         ppl (integer): The amount of people.
+        days (integer): The amount of days, or of any equally likely value.
 
     Returns:
         float: The percent chance of a match.
     """
-    if ppl > 365:
-        return Decimal(1 - 0)
-    frac_top: Decimal = Decimal(fct(365))
-    frac_bot: Decimal = Decimal((365**ppl) * fct(365 - ppl))
+    return Decimal(get_probability(ppl, days))
 
-    return 1 - Decimal(frac_top / frac_bot)
+
+def get_people(prob: float, days: int = DAYS) -> int:
+    """Will find the fewest people with at least some chance of a match.
+
+    Args:
+        prob (float): The chance, from 0 to 1.
+        days (integer): The amount of days, or of any equally likely value.
+
+    Returns:
+        integer: The amount of people.
+    """
+    if prob <= 0:
+        return 0
+    low: int = 1
+    high: int = days + 1
+    while low < high:
+        mid: int = (low + high) // 2
+        if get_probability(mid, days) >= prob:
+            high = mid
+        else:
+            low = mid + 1
+    return low
+
+
+def curve(ppl: int, days: int = DAYS) -> list[float]:
+    """Will calculate the chance of a match for every group size at once.
+
+    The log of each chance is a running sum of the one before, so the
+    whole curve costs one pass, vectorized when numpy is installed.
+
+    Args:
+        ppl (integer): The largest amount of people.
+        days (integer): The amount of days, or of any equally likely value.
+
+    Returns:
+        list: The chances for 1 to ppl people.
+    """
+    count: int = min(ppl, days)
+    ret: list[float]
+    if HAS_NUMPY:
+        logs: "NDArray[np.float64]" = np.cumsum(
+            np.log1p(-np.arange(count, dtype=np.float64) / days)
+        )
+        ret = (-np.expm1(logs)).tolist()
+    else:
+        ret = [
+            -expm1(total)
+            for total in accumulate(log1p(-k / days) for k in range(count))
+        ]
+    return ret + [1.0] * (ppl - count)
 
 
 if __name__ == "__main__":
     from random import randint
 
+    PARSER = argparse.ArgumentParser(description="Solves the birthday paradox")
+    PARSER.add_argument(
+        "people",
+        type=int,
+        nargs="?",
+        help="The amount of people, default is random",
+    )
+    PARSER.add_argument(
+        "-d",
+        "--days",
+        type=int,
+        default=DAYS,
+        help="The amount of days, or of any equally likely value, default is 365",
+    )
+    PARSER.add_argument(
+        "--curve",
+        action="store_true",
+        help="Print the chance for every amount of people up to people",
+    )
+    PARSER.add_argument(
+        "-p",
+        "--probability",
+        type=float,
+        help="Print the fewest people with at least this chance of a match",
+    )
+    ARGS: argparse.Namespace = PARSER.parse_args()
+
     print("Hello Console!")
 
-    setprec().prec = 1000
-    r: int = randint(1, 360)
-    print(f"{r} People : {get_percent(r):0.4%}")
+    if ARGS.probability is not None:
+        print(f"{get_people(ARGS.probability, ARGS.days)} People")
+    else:
+        r: int = ARGS.people or randint(1, 360)
+        if ARGS.curve:
+            for num, chance in enumerate(curve(r, ARGS.days), 1):
+                print(f"{num} People : {chance:0.4%}")
+        else:
+            print(f"{r} People : {get_percent(r, ARGS.days):0.4%}")
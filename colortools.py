@@ -9,30 +9,312 @@
 @copyright Copyright 2022 Evan Elias Young. All rights reserved.
 """
 
+import mmap
+import os
 import re
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Generic, Iterable, NamedTuple, Optional
+from typing import TypeVar, Union
+
+try:
+    import numpy as np
+
+    HAS_NUMPY: bool = True
+except ImportError:
+    HAS_NUMPY = False
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+HEX_FULL_RE: re.Pattern[str] = re.compile("#?([0-9A-f]{6})")
+HEX_SHORT_RE: re.Pattern[str] = re.compile("^#?([0-9A-f]{3})$")
+IS_RGB_RE: re.Pattern[str] = re.compile("(rgb)?\\(?(\\d+, ?){2}\\d+\\)?")
+RGB_RE: re.Pattern[str] = re.compile("(?:rgb)?(?:\\()?(\\d+), ?(\\d+), ?(\\d+)(?:\\))?")
+
+
+class CacheInfo(NamedTuple):
+    """The counters of an LRUCache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class LRUCache(Generic[K, V]):
+    """A bounded cache that forgets its least recently used entry first.
+
+    Unlike functools.lru_cache it counts evictions, which is what tells
+    whether maxsize is too small for the working set.
+    """
+
+    __slots__ = ("maxsize", "hits", "misses", "evictions", "_data")
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def get(self, key: K, factory: Callable[[K], V]) -> V:
+        """Will return the cached value for a key, creating it if missing.
+
+        Args:
+            key (hashable): The key to look up.
+            factory (callable): Creates the value from the key on a miss.
+
+        Returns:
+            any: The cached value.
+        """
+        try:
+            value: V = self._data[key]
+        except KeyError:
+            self.misses += 1
+            value = factory(key)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return value
+        self.hits += 1
+        self._data.move_to_end(key)
+        return value
+
+    def resize(self, maxsize: int) -> None:
+        """Will change the size of the cache, evicting entries if it shrinks.
+
+        Args:
+            maxsize (integer): The new number of entries to keep.
+        """
+        self.maxsize = maxsize
+        while len(self._data) > maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Will empty the cache and reset its counters."""
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        """Will return the counters of the cache.
+
+        Returns:
+            CacheInfo: The hits, misses, evictions, and sizes.
+        """
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self._data)
+        )
+
+
+def parse_rgb(color: str) -> bytes:
+    """Will parse a color string into its red, green, and blue bytes.
+
+    Args:
+        color (string): A full hex, short hex, or rgb color.
+
+    Returns:
+        bytes: The red, green, and blue values.
+    """
+    match = HEX_FULL_RE.match(color)
+    if match:
+        return bytes.fromhex(match.group(1))
+    match = HEX_SHORT_RE.match(color)
+    if match:
+        return bytes.fromhex("".join([c * 2 for c in match.group(1)]))
+    match = RGB_RE.search(color)
+    if match:
+        return bytes([int(d) for d in match.groups()])
+    raise ValueError(f"{color!r} is not a color")
+
+
+def rgb_to_hsl(red: int, green: int, blue: int) -> tuple[float, float, float]:
+    """Will convert an rgb color to hsl, memoized on the packed color.
+
+    Args:
+        red (integer): The red value, 0 to 255.
+        green (integer): The green value, 0 to 255.
+        blue (integer): The blue value, 0 to 255.
+
+    Returns:
+        tuple: The hue, saturation, and lightness values.
+    """
+    packed: int = (red << 16) | (green << 8) | blue
+    if HSL_TABLE is not None:
+        return HSL_TABLE.lookup(packed)
+    return HSL_CACHE.get(packed, _calc_hsl)
+
+
+def rgb_to_hsv(red: int, green: int, blue: int) -> tuple[float, float, float]:
+    """Will convert an rgb color to hsv, memoized on the packed color.
+
+    Args:
+        red (integer): The red value, 0 to 255.
+        green (integer): The green value, 0 to 255.
+        blue (integer): The blue value, 0 to 255.
+
+    Returns:
+        tuple: The hue, saturation, and value values.
+    """
+    packed: int = (red << 16) | (green << 8) | blue
+    if HSV_TABLE is not None:
+        return HSV_TABLE.lookup(packed)
+    return HSV_CACHE.get(packed, _calc_hsv)
+
+
+def _calc_hsl(packed: int) -> tuple[float, float, float]:
+    """Will calculate the hsl form of a packed 24-bit color.
+
+    Args:
+        packed (integer): The color as 0xRRGGBB.
+
+    Returns:
+        tuple: The hue, saturation, and lightness values.
+    """
+    tmp: list[float] = [
+        (packed >> 16) / 255,
+        ((packed >> 8) & 0xFF) / 255,
+        (packed & 0xFF) / 255,
+    ]
+    min_rgb: float = min(tmp)
+    max_rgb: float = max(tmp)
+    delta: float = max_rgb - min_rgb
+
+    light: float = (max_rgb + min_rgb) / 2
+    hue: float = 0
+    sat: float = 0
+    if max_rgb != min_rgb:
+        sat = (
+            delta / (2 - max_rgb - min_rgb)
+            if light > 0.5
+            else delta / (max_rgb + min_rgb)
+        )
+
+        if max_rgb == tmp[0]:
+            hue = (tmp[1] - tmp[2]) / delta + (6 if tmp[1] < tmp[2] else 0)
+        elif max_rgb == tmp[1]:
+            hue = (tmp[2] - tmp[0]) / delta + 2
+        elif max_rgb == tmp[2]:
+            hue = (tmp[0] - tmp[1]) / delta + 4
+
+        hue /= 6
+
+    return (hue, sat, light)
+
+
+def _calc_hsv(packed: int) -> tuple[float, float, float]:
+    """Will calculate the hsv form of a packed 24-bit color.
+
+    Args:
+        packed (integer): The color as 0xRRGGBB.
+
+    Returns:
+        tuple: The hue, saturation, and value values.
+    """
+    tmp: list[float] = [
+        (packed >> 16) / 255,
+        ((packed >> 8) & 0xFF) / 255,
+        (packed & 0xFF) / 255,
+    ]
+    min_rgb: float = min(tmp)
+    max_rgb: float = max(tmp)
+    delta: float = max_rgb - min_rgb
+
+    val: float = max_rgb
+    sat: float = 0 if max_rgb == 0 else delta / max_rgb
+    hue: float = 0
+    if max_rgb != min_rgb:
+        if max_rgb == tmp[0]:
+            hue = (tmp[1] - tmp[2]) / delta + (6 if tmp[1] < tmp[2] else 0)
+        elif max_rgb == tmp[1]:
+            hue = (tmp[2] - tmp[0]) / delta + 2
+        elif max_rgb == tmp[2]:
+            hue = (tmp[0] - tmp[1]) / delta + 4
+    hue /= 6
+    return (hue, sat, val)
 
 
 class Color:
     """Represents a color object which contains multiple conversions.
 
+    Each conversion is calculated the first time it is read and then kept.
+    Colors can not be changed once made, so from_string can share them.
+
     Returns:
         Color -- A color object.
     """
 
+    __slots__ = ("_raw", "_hex_type", "_hex", "_rgb", "_hsl", "_hsv")
+
     def __init__(self, color: str) -> None:
         self._raw: str = color
-        self.hex_type = (
+        self._hex_type: str = (
             "full"
-            if re.match("#?[0-9A-f]{6}", self._raw)
-            else "short"
-            if re.match("^#?[0-9A-f]{3}$", self._raw)
-            else "none"
+            if HEX_FULL_RE.match(color)
+            else "short" if HEX_SHORT_RE.match(color) else "none"
         )
-        self.is_rgb: bool = bool(re.match("(rgb)?\\(?(\\d+, ?){2}\\d+\\)?", self._raw))
-        self.hex: str = self.get_hex()
-        self.rgb: tuple[float, float, float] = self.get_rgb()
-        self.hsl: tuple[float, float, float] = self.get_hsl()
-        self.hsv: tuple[float, float, float] = self.get_hsv()
+        self._hex: Optional[str] = None
+        self._rgb: Optional[tuple[int, int, int]] = None
+        self._hsl: Optional[tuple[float, float, float]] = None
+        self._hsv: Optional[tuple[float, float, float]] = None
+
+    @staticmethod
+    def from_string(color: str) -> "Color":
+        """Will return a shared Color for a string from the color cache.
+
+        Args:
+            color (string): A full hex, short hex, or rgb color.
+
+        Returns:
+            Color: The color object, shared with other callers.
+        """
+        return COLOR_CACHE.get(color, Color)
+
+    @property
+    def hex_type(self) -> str:
+        """Whether the color was given as a full, short, or no hex."""
+        return self._hex_type
+
+    @property
+    def is_rgb(self) -> bool:
+        """Whether the color was given in rgb form."""
+        return bool(IS_RGB_RE.match(self._raw))
+
+    @property
+    def hex(self) -> str:
+        """The long form hex color."""
+        if self._hex is None:
+            self._hex = self.get_hex()
+        return self._hex
+
+    @property
+    def rgb(self) -> tuple[int, int, int]:
+        """The red, green, and blue values."""
+        if self._rgb is None:
+            self._rgb = self.get_rgb()
+        return self._rgb
+
+    @property
+    def hsl(self) -> tuple[float, float, float]:
+        """The hue, saturation, and lightness values."""
+        if self._hsl is None:
+            self._hsl = self.get_hsl()
+        return self._hsl
+
+    @property
+    def hsv(self) -> tuple[float, float, float]:
+        """The hue, saturation, and value values."""
+        if self._hsv is None:
+            self._hsv = self.get_hsv()
+        return self._hsv
 
     def get_hex(self) -> str:
         """Will calculate the hex form.
@@ -47,9 +329,8 @@ def get_hex(self) -> str:
         elif self.hex_type == "short":
             long_hex = "".join([c * 2 for c in self._raw.lstrip("#")])
         else:
-            prgb = re.split(
-                "(?:rgb)?(?:\\()?(\\d+), ?(\\d+), ?(\\d+)(?:\\))?", self._raw
-            )[1:4]
+            match = RGB_RE.search(self._raw)
+            prgb: tuple[str, ...] = match.groups() if match else ()
             long_hex = "".join([f"{int(d):02X}" for d in prgb])
         return long_hex
 
@@ -73,59 +354,551 @@ def get_hsl(self) -> tuple[float, float, float]:
             list: The hue, saturation, and lightness values.
 
         """
-        tmp: list[float] = [p / 255 for p in self.rgb]
-        min_rgb: float = min(tmp)
-        max_rgb: float = max(tmp)
-        delta: float = max_rgb - min_rgb
+        return rgb_to_hsl(*self.rgb)
 
-        light: float = (max_rgb + min_rgb) / 2
-        hue: float = 0
-        sat: float = 0
-        if max_rgb != min_rgb:
-            sat = (
-                delta / (2 - max_rgb - min_rgb)
-                if light > 0.5
-                else delta / (max_rgb + min_rgb)
-            )
+    def get_hsv(self) -> tuple[float, float, float]:
+        """Will calculate the hsv form.
 
-            if max_rgb == tmp[0]:
-                hue = (tmp[1] - tmp[2]) / delta + (6 if tmp[1] < tmp[2] else 0)
-            elif max_rgb == tmp[1]:
-                hue = (tmp[2] - tmp[0]) / delta + 2
-            elif max_rgb == tmp[2]:
-                hue = (tmp[0] - tmp[1]) / delta + 4
+        Returns:
+            list: The hue, saturation, and value values.
 
-            hue /= 6
+        """
+        return rgb_to_hsv(*self.rgb)
 
-        return (hue, sat, light)
 
-    def get_hsv(self) -> tuple[float, float, float]:
-        """Will calculate the hsv form.
+COLOR_CACHE: LRUCache[str, Color] = LRUCache(4096)
+HSL_CACHE: LRUCache[int, tuple[float, float, float]] = LRUCache(65536)
+HSV_CACHE: LRUCache[int, tuple[float, float, float]] = LRUCache(65536)
+
+
+def cache_info() -> dict[str, CacheInfo]:
+    """Will return the counters of every color cache.
+
+    Returns:
+        dictionary: The counters keyed by cache name.
+    """
+    return {
+        "color": COLOR_CACHE.info(),
+        "hsl": HSL_CACHE.info(),
+        "hsv": HSV_CACHE.info(),
+    }
+
+
+class ColorArray:
+    """Represents a batch of colors packed into one rgb buffer.
+
+    Conversions run over the whole batch at once, with NumPy when it is
+    installed, and are returned flat as consecutive triples.
+    """
+
+    __slots__ = ("rgb",)
+
+    def __init__(self, colors: Iterable[str] = ()) -> None:
+        self.rgb: bytearray = bytearray()
+        for color in colors:
+            self.rgb += parse_rgb(color)
+
+    @classmethod
+    def from_buffer(cls, data: Union[bytes, bytearray, memoryview]) -> "ColorArray":
+        """Will wrap packed rgb bytes, such as raw pixel data.
+
+        Args:
+            data (bytes-like): The red, green, and blue bytes of each color.
 
         Returns:
-            list: The hue, saturation, and value values.
+            ColorArray: The batch of colors.
+        """
+        if len(data) % 3:
+            raise ValueError("rgb data must be a multiple of three bytes")
+        ret: ColorArray = cls()
+        ret.rgb = bytearray(data)
+        return ret
 
+    def __len__(self) -> int:
+        return len(self.rgb) // 3
+
+    def __getitem__(self, index: int) -> tuple[int, int, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("color index out of range")
+        red, green, blue = self.rgb[index * 3 : index * 3 + 3]
+        return (red, green, blue)
+
+    def get_hex(self) -> list[str]:
+        """Will calculate the hex form of every color.
+
+        Returns:
+            list: The long form hex colors.
         """
-        tmp: list[float] = [p / 255 for p in self.rgb]
-        min_rgb: float = min(tmp)
-        max_rgb: float = max(tmp)
-        delta: float = max_rgb - min_rgb
-
-        val: float = max_rgb
-        sat: float = 0 if max_rgb == 0 else delta // max_rgb
-        hue: float = 0
-        if max_rgb != min_rgb:
-            if max_rgb == tmp[0]:
-                hue = (tmp[1] - tmp[2]) / delta + (6 if tmp[1] < tmp[2] else 0)
-            elif max_rgb == tmp[1]:
-                hue = (tmp[2] - tmp[0]) / delta + 2
-            elif max_rgb == tmp[2]:
-                hue = (tmp[0] - tmp[1]) / delta + 4
-        hue /= 6
-        return (hue, sat, val)
+        full: str = self.rgb.hex().upper()
+        return [full[i : i + 6] for i in range(0, len(full), 6)]
+
+    def get_hsl(self) -> Union["array[float]", "NDArray[np.float64]"]:
+        """Will calculate the hsl form of every color.
+
+        Returns:
+            array: The hue, saturation, and lightness values, flat.
+        """
+        if HAS_NUMPY:
+            if HSL_TABLE is not None:
+                return HSL_TABLE.lookup_numpy(self.rgb)
+            return _convert_numpy(self.rgb, light=True)
+        ret: array[float] = array("d")
+        for i in range(0, len(self.rgb), 3):
+            ret.extend(rgb_to_hsl(*self.rgb[i : i + 3]))
+        return ret
+
+    def get_hsv(self) -> Union["array[float]", "NDArray[np.float64]"]:
+        """Will calculate the hsv form of every color.
+
+        Returns:
+            array: The hue, saturation, and value values, flat.
+        """
+        if HAS_NUMPY:
+            if HSV_TABLE is not None:
+                return HSV_TABLE.lookup_numpy(self.rgb)
+            return _convert_numpy(self.rgb, light=False)
+        ret: array[float] = array("d")
+        for i in range(0, len(self.rgb), 3):
+            ret.extend(rgb_to_hsv(*self.rgb[i : i + 3]))
+        return ret
+
+
+def _convert_numpy(
+    data: Union[bytes, bytearray, memoryview], light: bool
+) -> "NDArray[np.float64]":
+    """Will convert packed rgb bytes to hsl or hsv with NumPy.
+
+    Mirrors rgb_to_hsl and rgb_to_hsv one step at a time, so the results
+    match the scalar functions.
+
+    Args:
+        data (bytes-like): The red, green, and blue bytes of each color.
+        light (boolean): Whether to return hsl rather than hsv.
+
+    Returns:
+        ndarray: The converted values, flat.
+    """
+    rgb = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3) / 255
+    red, green, blue = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    max_rgb = rgb.max(axis=1)
+    min_rgb = rgb.min(axis=1)
+    delta = max_rgb - min_rgb
+    gray = delta == 0
+    safe = np.where(gray, 1, delta)
+
+    hue = np.where(
+        max_rgb == red,
+        (green - blue) / safe + np.where(green < blue, 6, 0),
+        np.where(max_rgb == green, (blue - red) / safe + 2, (red - green) / safe + 4),
+    )
+    hue = np.where(gray, 0, hue) / 6
+
+    out = np.empty((len(rgb), 3))
+    out[:, 0] = hue
+    if light:
+        total = max_rgb + min_rgb
+        out[:, 2] = total / 2
+        out[:, 1] = np.where(
+            gray,
+            0,
+            np.where(
+                out[:, 2] > 0.5,
+                delta / np.where(gray, 1, 2 - max_rgb - min_rgb),
+                delta / np.where(gray, 1, total),
+            ),
+        )
+    else:
+        out[:, 2] = max_rgb
+        out[:, 1] = np.where(
+            max_rgb == 0, 0, delta / np.where(max_rgb == 0, 1, max_rgb)
+        )
+    return out.ravel()
+
+
+class Palette:
+    """Represents a palette that finds the nearest entry to any color.
+
+    The rgb cube is split into a grid of cells. The first time a cell is
+    queried it works out the few entries that could be nearest to any
+    point inside it, so later queries only compare against those.
+    """
+
+    __slots__ = ("colors", "_cells", "_points")
+
+    CELL_BITS: int = 4
+
+    def __init__(
+        self, colors: Iterable[Union[str, Color, tuple[int, int, int]]]
+    ) -> None:
+        self.colors: list[tuple[int, int, int]] = []
+        for color in colors:
+            if isinstance(color, str):
+                red, green, blue = parse_rgb(color)
+                self.colors.append((red, green, blue))
+            elif isinstance(color, Color):
+                self.colors.append(color.rgb)
+            else:
+                self.colors.append(color)
+        if not self.colors:
+            raise ValueError("a palette needs at least one color")
+        self._cells: dict[int, list[int]] = {}
+        if HAS_NUMPY:
+            self._points: NDArray[np.int32] = np.array(self.colors, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    def _candidates(self, cell: int) -> list[int]:
+        """Will return the entries that can be nearest to a point in a cell.
+
+        An entry is kept unless it is further from the whole cell than some
+        other entry is from the cell's furthest corner.
+
+        Args:
+            cell (integer): The cell's index.
+
+        Returns:
+            list: The palette indexes, in order.
+        """
+        try:
+            return self._cells[cell]
+        except KeyError:
+            pass
+        bits: int = Palette.CELL_BITS
+        mask: int = (1 << (8 - bits)) - 1
+        low: list[int] = [
+            (cell >> (2 * (8 - bits))) << bits,
+            ((cell >> (8 - bits)) & mask) << bits,
+            (cell & mask) << bits,
+        ]
+        high: list[int] = [c + (1 << bits) - 1 for c in low]
+
+        if HAS_NUMPY:
+            pal = self._points
+            gap = np.maximum(np.maximum(np.array(low) - pal, pal - np.array(high)), 0)
+            span = np.maximum(pal - np.array(low), np.array(high) - pal)
+            bound_np = (span * span).sum(axis=1).min()
+            found: list[int] = np.flatnonzero(
+                (gap * gap).sum(axis=1) <= bound_np
+            ).tolist()
+            self._cells[cell] = found
+            return found
+
+        # Per channel, the squared gap to the cell and to its far side.
+        gaps: list[list[int]] = [
+            [max(lo_c - v, 0, v - hi_c) ** 2 for v in range(256)]
+            for lo_c, hi_c in zip(low, high)
+        ]
+        spans: list[list[int]] = [
+            [max(v - lo_c, hi_c - v) ** 2 for v in range(256)]
+            for lo_c, hi_c in zip(low, high)
+        ]
+        near: list[int] = [
+            gaps[0][red] + gaps[1][green] + gaps[2][blue]
+            for red, green, blue in self.colors
+        ]
+        far: list[int] = [
+            spans[0][red] + spans[1][green] + spans[2][blue]
+            for red, green, blue in self.colors
+        ]
+        bound: int = min(far)
+        ret: list[int] = [i for i, dist in enumerate(near) if dist <= bound]
+        self._cells[cell] = ret
+        return ret
+
+    def _cell(self, red: int, green: int, blue: int) -> int:
+        """Will return the index of the cell holding a color.
+
+        Args:
+            red (integer): The red value, 0 to 255.
+            green (integer): The green value, 0 to 255.
+            blue (integer): The blue value, 0 to 255.
+
+        Returns:
+            integer: The cell's index.
+        """
+        shift: int = 8 - Palette.CELL_BITS
+        return (
+            ((red >> shift) << (2 * Palette.CELL_BITS))
+            | ((green >> shift) << Palette.CELL_BITS)
+            | (blue >> shift)
+        )
+
+    def nearest(self, red: int, green: int, blue: int) -> int:
+        """Will find the palette entry nearest to a color.
+
+        Ties go to the earlier entry, as a linear scan would.
+
+        Args:
+            red (integer): The red value, 0 to 255.
+            green (integer): The green value, 0 to 255.
+            blue (integer): The blue value, 0 to 255.
+
+        Returns:
+            integer: The index of the nearest palette entry.
+        """
+        best: int = -1
+        best_dist: int = 1 << 20
+        colors: list[tuple[int, int, int]] = self.colors
+        for i in self._candidates(self._cell(red, green, blue)):
+            pal_r, pal_g, pal_b = colors[i]
+            dist: int = (pal_r - red) ** 2 + (pal_g - green) ** 2 + (pal_b - blue) ** 2
+            if dist < best_dist:
+                best, best_dist = i, dist
+        return best
+
+    def quantize(
+        self, pixels: Union[ColorArray, bytes, bytearray, memoryview]
+    ) -> Union["array[int]", "NDArray[np.intp]"]:
+        """Will map every pixel of a packed rgb buffer to its nearest entry.
+
+        Each distinct color is only searched once. With NumPy the distinct
+        colors are searched a whole grid cell at a time.
+
+        Args:
+            pixels (ColorArray or bytes-like): The red, green, and blue bytes.
+
+        Returns:
+            array: The palette index of each pixel.
+        """
+        data: Union[bytes, bytearray, memoryview] = (
+            pixels.rgb if isinstance(pixels, ColorArray) else pixels
+        )
+        if len(data) % 3:
+            raise ValueError("rgb data must be a multiple of three bytes")
+        if HAS_NUMPY:
+            return self._quantize_numpy(data)
+
+        ret: array[int] = array("I")
+        seen: dict[bytes, int] = {}
+        view: memoryview = memoryview(data).cast("B")
+        for i in range(0, len(view), 3):
+            key: bytes = bytes(view[i : i + 3])
+            try:
+                ret.append(seen[key])
+            except KeyError:
+                index: int = self.nearest(*key)
+                seen[key] = index
+                ret.append(index)
+        return ret
+
+    def _quantize_numpy(
+        self, data: Union[bytes, bytearray, memoryview]
+    ) -> "NDArray[np.intp]":
+        """Will map packed rgb bytes to palette indexes with NumPy.
+
+        Args:
+            data (bytes-like): The red, green, and blue bytes of each pixel.
+
+        Returns:
+            ndarray: The palette index of each pixel.
+        """
+        rgb = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        uniq, inverse = np.unique(packed, return_inverse=True)
+        points = np.stack([uniq >> 16, (uniq >> 8) & 0xFF, uniq & 0xFF], axis=1)
+
+        shift: int = 8 - Palette.CELL_BITS
+        cells = (
+            ((points[:, 0] >> shift) << (2 * Palette.CELL_BITS))
+            | ((points[:, 1] >> shift) << Palette.CELL_BITS)
+            | (points[:, 2] >> shift)
+        )
+        order = np.argsort(cells, kind="stable")
+        starts = np.flatnonzero(np.diff(cells[order], prepend=-1))
+        ends = np.append(starts[1:], len(order))
+
+        palette = self._points
+        found = np.empty(len(uniq), dtype=np.intp)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            members = order[start:end]
+            cand = np.array(self._candidates(int(cells[members[0]])), dtype=np.intp)
+            diff = points[members, None, :] - palette[None, cand, :]
+            found[members] = cand[(diff * diff).sum(axis=2).argmin(axis=1)]
+        ret: NDArray[np.intp] = found[inverse.ravel()]
+        return ret
+
+
+class ColorTable:
+    """Represents a memory-mapped hsl or hsv table of every 24-bit color.
+
+    Each color holds three unsigned 16-bit values scaled to 0 to 65535, so
+    a table is 96MiB and agrees with the float math to within 1 / 65535.
+    Tables are written in the machine's byte order.
+    """
+
+    __slots__ = ("kind", "path", "_file", "_map", "_view")
+
+    SIZE: int = 3 * (1 << 24)
+
+    def __init__(self, path: str, kind: str) -> None:
+        if kind not in ("hsl", "hsv"):
+            raise ValueError(f"unknown table kind {kind!r}")
+        self.kind: str = kind
+        self.path: str = path
+        self._file = open(path, "rb")
+        self._map: mmap.mmap = mmap.mmap(
+            self._file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+        if len(self._map) != ColorTable.SIZE * 2:
+            self.close()
+            raise ValueError(f"{path} is not a color table")
+        self._view: memoryview = memoryview(self._map).cast("H")
+
+    @staticmethod
+    def build(path: str, kind: str) -> None:
+        """Will calculate a table and write it to a file.
+
+        Args:
+            path (string): The file to write.
+            kind (string): Either "hsl" or "hsv".
+        """
+        tmp_path: str = f"{path}.tmp"
+        with open(tmp_path, "wb") as out:
+            for red in range(256):
+                out.write(_table_slice(red, kind))
+        os.replace(tmp_path, path)
+
+    def lookup(self, packed: int) -> tuple[float, float, float]:
+        """Will look up a packed 24-bit color.
+
+        Args:
+            packed (integer): The color as 0xRRGGBB.
+
+        Returns:
+            tuple: The three converted values.
+        """
+        index: int = packed * 3
+        view: memoryview = self._view
+        return (view[index] / 65535, view[index + 1] / 65535, view[index + 2] / 65535)
+
+    def lookup_numpy(
+        self, data: Union[bytes, bytearray, memoryview]
+    ) -> "NDArray[np.float64]":
+        """Will look up packed rgb bytes with NumPy.
+
+        Args:
+            data (bytes-like): The red, green, and blue bytes of each color.
+
+        Returns:
+            ndarray: The converted values, flat.
+        """
+        rgb = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.uint32)
+        packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        table = np.frombuffer(self._map, dtype=np.uint16).reshape(-1, 3)
+        ret: NDArray[np.float64] = table[packed].ravel() / 65535
+        return ret
+
+    def close(self) -> None:
+        """Will unmap the table and close its file."""
+        if hasattr(self, "_view"):
+            self._view.release()
+        self._map.close()
+        self._file.close()
+
+
+HSL_TABLE: Optional[ColorTable] = None
+HSV_TABLE: Optional[ColorTable] = None
+
+
+def _table_slice(red: int, kind: str) -> bytes:
+    """Will calculate the part of a table where red is fixed.
+
+    Args:
+        red (integer): The red value, 0 to 255.
+        kind (string): Either "hsl" or "hsv".
+
+    Returns:
+        bytes: The 65536 scaled triples, in machine byte order.
+    """
+    if HAS_NUMPY:
+        index = np.arange(1 << 16, dtype=np.uint32)
+        rgb = np.empty((1 << 16, 3), dtype=np.uint8)
+        rgb[:, 0] = red
+        rgb[:, 1] = index >> 8
+        rgb[:, 2] = index & 0xFF
+        values = _convert_numpy(rgb.tobytes(), light=kind == "hsl")
+        return bytes(np.rint(values * 65535).astype(np.uint16).tobytes())
+    calc: Callable[[int], tuple[float, float, float]] = (
+        _calc_hsl if kind == "hsl" else _calc_hsv
+    )
+    ret: array[int] = array("H")
+    for packed in range(red << 16, (red + 1) << 16):
+        ret.extend([round(v * 65535) for v in calc(packed)])
+    return ret.tobytes()
+
+
+def use_tables(directory: Optional[str] = None) -> None:
+    """Will switch hsl and hsv conversions to full lookup tables.
+
+    Missing tables are built first, which takes a while once. After that
+    rgb_to_hsl, rgb_to_hsv, Color, and ColorArray read from the tables.
+
+    Args:
+        directory (string): Where the tables live. Defaults to this folder.
+    """
+    global HSL_TABLE, HSV_TABLE
+    if directory is None:
+        directory = os.path.dirname(os.path.realpath(__file__))
+    tables: list[ColorTable] = []
+    for kind in ("hsl", "hsv"):
+        path: str = os.path.join(directory, f"colortools-{kind}-{sys.byteorder}.lut")
+        if not os.path.isfile(path):
+            ColorTable.build(path, kind)
+        tables.append(ColorTable(path, kind))
+    stop_tables()
+    HSL_TABLE, HSV_TABLE = tables
+
+
+def stop_tables() -> None:
+    """Will switch hsl and hsv conversions back to calculating them."""
+    global HSL_TABLE, HSV_TABLE
+    for table in (HSL_TABLE, HSV_TABLE):
+        if table is not None:
+            table.close()
+    HSL_TABLE = HSV_TABLE = None
+
+
+def benchmark(count: int = 1_000_000, directory: Optional[str] = None) -> None:
+    """Will time the hsl conversion paths over random colors.
+
+    Args:
+        count (integer): The number of colors. Defaults to 1,000,000.
+        directory (string): Where the tables live. Defaults to this folder.
+    """
+    colors: ColorArray = ColorArray.from_buffer(os.urandom(count * 3))
+    packed: list[int] = [
+        int.from_bytes(colors.rgb[i : i + 3], "big")
+        for i in range(0, len(colors.rgb), 3)
+    ]
+    use_tables(directory)
+    assert HSL_TABLE is not None
+    table: ColorTable = HSL_TABLE
+
+    timings: list[tuple[str, Callable[[], object]]] = [
+        ("scalar math", lambda: [_calc_hsl(p) for p in packed]),
+        ("scalar table", lambda: [table.lookup(p) for p in packed]),
+    ]
+    if HAS_NUMPY:
+        timings += [
+            ("numpy math", lambda: _convert_numpy(colors.rgb, light=True)),
+            ("numpy table", lambda: table.lookup_numpy(colors.rgb)),
+        ]
+    for name, func in timings:
+        start: float = time.perf_counter()
+        func()
+        elapsed: float = time.perf_counter() - start
+        print(f"{name:<12} : {elapsed:8.3f}s {count / elapsed / 1e6:8.2f}M colors/s")
+    stop_tables()
 
 
 if __name__ == "__main__":
+    if "--bench" in sys.argv[1:]:
+        benchmark()
+        sys.exit()
+
     print("Hello Console!")
 
     fav: Color = Color("#003366")
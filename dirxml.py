@@ -10,10 +10,22 @@
 """
 
 import os
+import sys
+import io
+import gzip
+import json
+import lzma
+import sqlite3
+import time
+import threading
 from sys import platform
 import argparse
+from itertools import islice
+from typing import Iterator, Optional, Protocol, TextIO, Union
 from xml.sax.saxutils import quoteattr
 
+from treescan import Entry, Scanner, stat_entry
+
 PARSER = argparse.ArgumentParser(description="Tree a directory into an xml file")
 PARSER.add_argument("path", metavar="path", help="The starting path")
 PARSER.add_argument(
@@ -41,7 +53,7 @@
     const=True,
     default=False,
     metavar="open",
-    help="Open the xml file when complete",
+    help="Open the output file when complete",
 )
 PARSER.add_argument(
     "--folders",
@@ -52,81 +64,655 @@
     metavar="folders",
     help="Only list folders",
 )
+PARSER.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    metavar="jobs",
+    help="List this many directories at once, for high latency storage",
+)
+PARSER.add_argument(
+    "-f",
+    "--format",
+    choices=("xml", "ndjson", "bin"),
+    default="xml",
+    help="The output format, xml by default",
+)
+PARSER.add_argument(
+    "-z",
+    "--compress",
+    choices=("none", "gz", "xz"),
+    default="none",
+    help="Compress the output while it is written",
+)
+PARSER.add_argument(
+    "-i",
+    "--incremental",
+    action="store_true",
+    help="Reuse unchanged directories from the snapshot of the last run",
+)
+PARSER.add_argument(
+    "--processes",
+    action="store_true",
+    help="Use worker processes instead of threads for --jobs",
+)
 ARGS = PARSER.parse_args()
+if ARGS.v and ARGS.format != "xml":
+    PARSER.error("-v only prints xml, not --format ndjson or bin")
 ARGS.path = (
     ARGS.path[:-1] if ARGS.path.endswith("/") or ARGS.path.endswith("\\") else ARGS.path
 )
 
 lend: str = "" if ARGS.m else "\n"
 lpre: str = "" if ARGS.m else "  "
-OUT_FILE = open(
-    os.path.join(
-        os.path.dirname(os.path.realpath(__file__)),
-        f'{os.path.basename(ARGS.path)}{".min" if ARGS.m else ""}.xml',
-    ),
-    "w",
-    encoding="utf-8",
-    newline="\n",
-)
-OUT_FILE.write(f'<?xml version="1.0" encoding="utf-8" ?>{lend}')
 
 
-def dir_xml(path: str) -> str:
-    """Will return the xml of a directory.
+class ListingWriter(Protocol):
+    """Writes a listing one entry at a time as the tree is walked.
+
+    Nothing is held back beyond the output file's own buffer, so memory
+    use does not grow with the size of the tree.
+    """
+
+    def header(self) -> None:
+        """Will write whatever starts the listing."""
+
+    def open_dir(self, depth: int, name: str, permissions: str) -> None:
+        """Will write the start of a directory with entries.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+            permissions (string): The directory's octal permissions.
+        """
+
+    def empty_dir(self, depth: int, name: str) -> None:
+        """Will write a directory with no entries.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+        """
+
+    def close_dir(self, depth: int) -> None:
+        """Will write the end of a directory.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+        """
+
+    def file(self, depth: int, attrs: dict[str, str]) -> None:
+        """Will write a file.
+
+        Args:
+            depth (integer): The nesting depth of the file.
+            attrs (dictionary): The file's attributes, in order.
+        """
+
+
+class XmlWriter(ListingWriter):
+    """Writes the xml listing one element at a time as the tree is walked."""
+
+    def __init__(self, out: TextIO, echo: bool = False) -> None:
+        self.out: TextIO = out
+        self.echo: bool = echo
+        self._indents: list[str] = [""]
+
+    def _write(self, depth: int, text: str) -> None:
+        """Will write one indented line.
+
+        Args:
+            depth (integer): The nesting depth of the line.
+            text (string): The line, including its ending.
+        """
+        while len(self._indents) <= depth:
+            self._indents.append(self._indents[-1] + lpre)
+        line: str = f"{self._indents[depth]}{text}"
+        self.out.write(line)
+        if self.echo:
+            sys.stdout.write(line)
+
+    def header(self) -> None:
+        """Will write the xml declaration."""
+        self.out.write(f'<?xml version="1.0" encoding="utf-8" ?>{lend}')
+
+    def open_dir(self, depth: int, name: str, permissions: str) -> None:
+        """Will write the opening tag of a directory with entries.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+            permissions (string): The directory's octal permissions.
+        """
+        self._write(
+            depth,
+            f"<dir name={quoteattr(name)} permissions={quoteattr(permissions)}>{lend}",
+        )
+
+    def empty_dir(self, depth: int, name: str) -> None:
+        """Will write a directory with no entries.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+        """
+        self._write(depth, f"<dir name={quoteattr(name)} />{lend}")
+
+    def close_dir(self, depth: int) -> None:
+        """Will write the closing tag of a directory.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+        """
+        ending: str = lend if depth else "\n"
+        self._write(depth, f"</dir>{ending}")
+
+    def file(self, depth: int, attrs: dict[str, str]) -> None:
+        """Will write a file.
+
+        Args:
+            depth (integer): The nesting depth of the file.
+            attrs (dictionary): The file's attributes, in order.
+        """
+        self._write(
+            depth,
+            f'<file {" ".join([f"{k}={quoteattr(attrs[k])}" for k in attrs])} />{lend}',
+        )
+
+
+class NdjsonWriter(ListingWriter):
+    """Writes the listing as one json object per line.
+
+    Every record has a type "t" and depth "d". Directories ("d", or "e"
+    when empty) and files ("f") carry a name "n". Permissions "p" and file
+    extensions "x" are ids into a string table; each string is defined by
+    an {"s": id, "v": string} record before its first use. Hidden files
+    have "h": 1. A directory ends where the next record at its depth or
+    shallower begins.
+    """
+
+    def __init__(self, out: TextIO) -> None:
+        self.out: TextIO = out
+        self._strings: dict[str, int] = {}
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":")
+        ).encode
+
+    def _string(self, value: str) -> int:
+        """Will return a string's id, defining it first if it is new.
+
+        Args:
+            value (string): The string.
+
+        Returns:
+            integer: The string's id.
+        """
+        try:
+            return self._strings[value]
+        except KeyError:
+            ident: int = len(self._strings)
+            self._strings[value] = ident
+            self.out.write(f'{{"s":{ident},"v":{self._encode(value)}}}\n')
+            return ident
+
+    def header(self) -> None:
+        """Will write nothing, as records need no header."""
+
+    def open_dir(self, depth: int, name: str, permissions: str) -> None:
+        """Will write a directory record.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+            permissions (string): The directory's octal permissions.
+        """
+        perm: int = self._string(permissions)
+        self.out.write(f'{{"t":"d","d":{depth},"n":{self._encode(name)},"p":{perm}}}\n')
+
+    def empty_dir(self, depth: int, name: str) -> None:
+        """Will write an empty directory record.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+        """
+        self.out.write(f'{{"t":"e","d":{depth},"n":{self._encode(name)}}}\n')
+
+    def close_dir(self, depth: int) -> None:
+        """Will write nothing, as depths already show where directories end.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+        """
+
+    def file(self, depth: int, attrs: dict[str, str]) -> None:
+        """Will write a file record.
+
+        Args:
+            depth (integer): The nesting depth of the file.
+            attrs (dictionary): The file's attributes, in order.
+        """
+        perm: int = self._string(attrs["permissions"])
+        line: str = (
+            f'{{"t":"f","d":{depth},"n":{self._encode(attrs["name"])},"p":{perm}'
+        )
+        if "hidden" in attrs:
+            line += ',"h":1'
+        if "ext" in attrs:
+            line += f',"x":{self._string(attrs["ext"])}'
+        self.out.write(f"{line}}}\n")
+
+
+class BinaryWriter(ListingWriter):
+    """Writes the listing as compact length-prefixed records.
+
+    The stream starts with MAGIC. Each record is a one byte type followed
+    by its fields, where numbers are LEB128 varints and strings are a
+    varint length then UTF-8 bytes:
+
+        S string         defines the next string table id, from 0 up
+        D name perm      opens a directory with entries
+        E name           a directory with no entries
+        C                closes the innermost open directory
+        F flags name perm [ext]
+                         a file; flags bit 0 is hidden, bit 1 means an
+                         extension id follows
+
+    Permissions and extensions are ids into the string table.
+    """
+
+    MAGIC: bytes = b"DIRXML\x01\n"
+
+    def __init__(self, out: io.BufferedIOBase) -> None:
+        self.out: io.BufferedIOBase = out
+        self._strings: dict[str, int] = {}
+
+    @staticmethod
+    def _varint(num: int) -> bytes:
+        """Will encode a number as a LEB128 varint.
+
+        Args:
+            num (integer): The non-negative number.
+
+        Returns:
+            bytes: The encoded number.
+        """
+        ret: bytearray = bytearray()
+        while num > 0x7F:
+            ret.append((num & 0x7F) | 0x80)
+            num >>= 7
+        ret.append(num)
+        return bytes(ret)
+
+    def _text(self, value: str) -> bytes:
+        """Will encode a length-prefixed string.
+
+        Args:
+            value (string): The string.
+
+        Returns:
+            bytes: The encoded string.
+        """
+        raw: bytes = value.encode("utf-8", "surrogateescape")
+        return self._varint(len(raw)) + raw
+
+    def _string(self, value: str) -> bytes:
+        """Will return a string's encoded id, defining it first if it is new.
+
+        Args:
+            value (string): The string.
+
+        Returns:
+            bytes: The string's id as a varint.
+        """
+        try:
+            return self._varint(self._strings[value])
+        except KeyError:
+            ident: int = len(self._strings)
+            self._strings[value] = ident
+            self.out.write(b"S" + self._text(value))
+            return self._varint(ident)
+
+    def header(self) -> None:
+        """Will write the magic bytes."""
+        self.out.write(BinaryWriter.MAGIC)
+
+    def open_dir(self, depth: int, name: str, permissions: str) -> None:
+        """Will write a D record.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+            permissions (string): The directory's octal permissions.
+        """
+        perm: bytes = self._string(permissions)
+        self.out.write(b"D" + self._text(name) + perm)
+
+    def empty_dir(self, depth: int, name: str) -> None:
+        """Will write an E record.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+            name (string): The directory's name.
+        """
+        self.out.write(b"E" + self._text(name))
+
+    def close_dir(self, depth: int) -> None:
+        """Will write a C record.
+
+        Args:
+            depth (integer): The nesting depth of the directory.
+        """
+        self.out.write(b"C")
+
+    def file(self, depth: int, attrs: dict[str, str]) -> None:
+        """Will write an F record.
+
+        Args:
+            depth (integer): The nesting depth of the file.
+            attrs (dictionary): The file's attributes, in order.
+        """
+        perm: bytes = self._string(attrs["permissions"])
+        ext: bytes = self._string(attrs["ext"]) if "ext" in attrs else b""
+        flags: int = (1 if "hidden" in attrs else 0) | (2 if ext else 0)
+        self.out.write(b"F" + bytes([flags]) + self._text(attrs["name"]) + perm + ext)
+
+
+def open_output(
+    path: str, compress: str
+) -> Union[io.BufferedWriter, gzip.GzipFile, lzma.LZMAFile]:
+    """Will open the output file, compressing it on the fly if asked.
 
     Args:
-        path (string): The folder's path.
+        path (string): The file's path.
+        compress (string): One of "none", "gz", or "xz".
 
     Returns:
-        string: The folder's xml section.
+        BufferedIOBase: The binary stream to write to.
+    """
+    if compress == "gz":
+        return gzip.GzipFile(path, "wb")
+    if compress == "xz":
+        return lzma.LZMAFile(path, "wb")
+    return io.BufferedWriter(io.FileIO(path, "w"), buffer_size=1 << 20)
+
+
+def get_permissions(mode: int) -> str:
+    """Will return the octal permissions of a stat mode.
+
+    Args:
+        mode (integer): The stat mode.
+
+    Returns:
+        string: The three digit permissions.
 
     """
-    ret: str = f"<dir name={quoteattr(os.path.basename(path))} "
-    ret += f"permissions={quoteattr(oct(os.stat(path).st_mode & 0o0777)[-3:])}>{lend}"
-
-    for i in os.listdir(path):
-        item_path = os.path.join(path, i)
-        if os.path.isdir(item_path):
-            ret += lend.join(
-                [
-                    f"{lpre}{li}"
-                    for li in dir_xml(os.path.join(path, i)).split("\n")[:-1]
-                ]
+    return oct(mode & 0o0777)[-3:]
+
+
+def get_file_attrs(entry: Entry) -> dict[str, str]:
+    """Will return the xml attributes of a file.
+
+    Args:
+        entry (Entry): The file's entry.
+
+    Returns:
+        dictionary: The file's attributes, in order.
+
+    """
+    name: str = entry.name
+    attrs = {"name": name, "permissions": get_permissions(entry.mode)}
+    dir_trace = 0
+    if name.startswith("."):
+        attrs["hidden"] = "1"
+        dir_trace = 1
+    if name.count(".") > dir_trace:
+        attrs["ext"] = name.split(".")[-1]
+    return attrs
+
+
+class Snapshot:
+    """Remembers every directory's listing between runs of dirxml.
+
+    A directory whose mtime and inode match the last run still has the
+    same entries, so its listing and the stat of its files come from the
+    snapshot instead of the disk; only its subdirectories are stat-ed, to
+    check them in turn. Changes that leave a directory's mtime alone, such
+    as a chmod of a file inside it, are not noticed. The snapshot is an
+    sqlite database, so it is never loaded into memory as a whole. The
+    scanner's workers look up directories too, so lookups take a lock.
+    """
+
+    # A directory changed this close to when it was listed may change again
+    # without its mtime moving, so it is not trusted next time.
+    RACY_NS: int = 2_000_000_000
+
+    def __init__(self, path: str, root: str) -> None:
+        self.path: str = path
+        self.root: str = root
+        self.reused: int = 0
+        self.scanned: int = 0
+        self._old: Optional[sqlite3.Connection] = None
+        self._lock: threading.Lock = threading.Lock()
+        if os.path.isfile(path):
+            self._old = sqlite3.connect(path, check_same_thread=False)
+            meta = self._old.execute("SELECT folders FROM meta").fetchone()
+            if meta is None or bool(meta[0]) != ARGS.folders:
+                self._old.close()
+                self._old = None
+        if os.path.exists(f"{path}.tmp"):
+            os.remove(f"{path}.tmp")
+        self._new: sqlite3.Connection = sqlite3.connect(f"{path}.tmp")
+        self._new.executescript("""
+            CREATE TABLE meta (folders INTEGER);
+            CREATE TABLE dirs (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, inode INTEGER, items TEXT
+            );
+            """)
+        self._new.execute("INSERT INTO meta VALUES (?)", (int(ARGS.folders),))
+
+    def _key(self, entry: Entry) -> str:
+        """Will return a directory's path relative to the root.
+
+        Args:
+            entry (Entry): The directory's entry.
+
+        Returns:
+            string: The snapshot key.
+        """
+        return entry.path[len(self.root) :]
+
+    def _lookup(self, entry: Entry) -> Optional[str]:
+        """Will return a directory's stored items if it is unchanged.
+
+        Args:
+            entry (Entry): The directory's entry, with its stat.
+
+        Returns:
+            string: The stored items, or None if the disk must be read.
+        """
+        if self._old is None:
+            return None
+        with self._lock:
+            row = self._old.execute(
+                "SELECT items FROM dirs WHERE path = ? AND mtime_ns = ? AND inode = ?",
+                (self._key(entry), entry.mtime_ns, entry.inode),
+            ).fetchone()
+        return None if row is None else str(row[0])
+
+    def is_unchanged(self, entry: Entry) -> bool:
+        """Will check whether a directory can be taken from the snapshot.
+
+        Args:
+            entry (Entry): The directory's entry, with its stat.
+
+        Returns:
+            boolean: Whether the directory is unchanged.
+        """
+        return self._lookup(entry) is not None
+
+    def is_changed(self, entry: Entry) -> bool:
+        """Will check whether a directory must be listed from the disk.
+
+        Args:
+            entry (Entry): The directory's entry, with its stat.
+
+        Returns:
+            boolean: Whether the directory changed.
+        """
+        return not self.is_unchanged(entry)
+
+    def scan(self, entry: Entry, scanner: Scanner) -> list[Entry]:
+        """Will list a directory from the snapshot, or the disk if changed.
+
+        Either way, the listing is stored for the next run.
+
+        Args:
+            entry (Entry): The directory's entry, with its stat.
+            scanner (Scanner): Lists the directory if it changed.
+
+        Returns:
+            list: The directory's entries, in listing order.
+        """
+        stored: Optional[str] = self._lookup(entry)
+        entries: list[Entry]
+        if stored is None:
+            self.scanned += 1
+            entries = scanner.scan(entry.path)
+            items: str = json.dumps(
+                [[e.name, 2 if e.is_dir else int(e.is_file), e.mode] for e in entries],
+                separators=(",", ":"),
             )
-            ret += lend
-        elif os.path.isfile(item_path) and not ARGS.folders:
-            attrs = {
-                "name": i,
-                "permissions": oct(os.stat(os.path.join(path, i)).st_mode & 0o0777)[
-                    -3:
-                ],
-            }
-            dir_trace = 0
-            if i.startswith("."):
-                attrs["hidden"] = "1"
-                dir_trace = 1
-            if i.count(".") > dir_trace:
-                attrs["ext"] = i.split(".")[-1]
-
-            ret += f'{lpre}<file {" ".join([f"{k}={quoteattr(attrs[k])}" for k in attrs])} />{lend}'
-
-    ret += "</dir>\n"
-    if os.listdir(path) == []:
-        ret = f"<dir name={quoteattr(os.path.basename(path))} />{lend}"
-    return ret
-
-
-xml: str = dir_xml(ARGS.path)
-if ARGS.v:
-    print(xml)
-OUT_FILE.write(xml)
-OUT_FILE.close()
-
-if ARGS.o:
-    stpre: str = "start" if platform == "win32" else "open"
-    cmd: str = f"{stpre} "
-    cmd += os.path.join(
-        os.path.dirname(os.path.realpath(__file__)), os.path.basename(ARGS.path)
+            if entry.mtime_ns + Snapshot.RACY_NS > time.time_ns():
+                return entries
+        else:
+            self.reused += 1
+            items = stored
+            entries = []
+            for name, kind, mode in json.loads(stored):
+                item_path: str = os.path.join(entry.path, name)
+                if kind == 2:
+                    try:
+                        entries.append(stat_entry(item_path))
+                        continue
+                    except OSError:
+                        kind = 0
+                entries.append(Entry(name, item_path, False, kind == 1, False, mode))
+        self._new.execute(
+            "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?)",
+            (self._key(entry), entry.mtime_ns, entry.inode, items),
+        )
+        return entries
+
+    def save(self) -> None:
+        """Will replace the old snapshot with the one just written."""
+        if self._old is not None:
+            self._old.close()
+        self._new.commit()
+        self._new.close()
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def dir_xml(
+    path: str,
+    writer: ListingWriter,
+    scanner: Scanner,
+    snapshot: Optional[Snapshot] = None,
+) -> None:
+    """Will write the xml of a directory tree.
+
+    The tree is walked with an explicit stack rather than recursion, so
+    deep trees neither hit the recursion limit nor build nested strings.
+    Each entry is stat-ed once while its directory is listed. Every open
+    directory keeps the scanner listing its next few subdirectories.
+
+    Args:
+        path (string): The folder's path.
+        writer (ListingWriter): Where the listing is written.
+        scanner (Scanner): Lists the directories.
+        snapshot (Snapshot): Supplies unchanged directories, if given.
+
+    """
+    # Each level holds its remaining entries and its subdirectories that
+    # have not been prefetched yet.
+    stack: list[tuple[Iterator[Entry], Iterator[str]]] = []
+
+    def enter(entry: Entry) -> None:
+        entries: list[Entry] = (
+            scanner.scan(entry.path)
+            if snapshot is None
+            else snapshot.scan(entry, scanner)
+        )
+        if not entries:
+            writer.empty_dir(len(stack), entry.name)
+            return
+        writer.open_dir(len(stack), entry.name, get_permissions(entry.mode))
+        ahead: Iterator[str] = iter(
+            [
+                e.path
+                for e in entries
+                if e.is_dir and (snapshot is None or snapshot.is_changed(e))
+            ]
+        )
+        scanner.prefetch(islice(ahead, scanner.window))
+        stack.append((iter(entries), ahead))
+
+    enter(stat_entry(path))
+    while stack:
+        entries, ahead = stack[-1]
+        for entry in entries:
+            if entry.is_dir:
+                scanner.prefetch(islice(ahead, 1))
+                enter(entry)
+                break
+            if entry.is_file and not ARGS.folders:
+                writer.file(len(stack), get_file_attrs(entry))
+        else:
+            stack.pop()
+            writer.close_dir(len(stack))
+
+
+if __name__ == "__main__":
+    OUT_EXT: str = {
+        "xml": f'{".min" if ARGS.m else ""}.xml',
+        "ndjson": ".ndjson",
+        "bin": ".bin",
+    }[ARGS.format]
+    OUT_PATH: str = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)),
+        f"{os.path.basename(ARGS.path)}{OUT_EXT}",
+    )
+    if ARGS.compress != "none":
+        OUT_PATH += f".{ARGS.compress}"
+    SNAPSHOT: Optional[Snapshot] = (
+        Snapshot(f"{OUT_PATH}.snap", ARGS.path) if ARGS.incremental else None
     )
-    cmd += ".xml"
-    os.system(cmd)
+    with open_output(OUT_PATH, ARGS.compress) as OUT_FILE, Scanner(
+        ARGS.jobs,
+        ARGS.processes,
+        stat_files=not ARGS.folders,
+        read_ahead=None if SNAPSHOT is None else SNAPSHOT.is_changed,
+    ) as SCANNER:
+        OUT_TEXT: Optional[io.TextIOWrapper] = None
+        WRITER: ListingWriter
+        if ARGS.format == "bin":
+            WRITER = BinaryWriter(OUT_FILE)
+        else:
+            OUT_TEXT = io.TextIOWrapper(OUT_FILE, encoding="utf-8", newline="\n")
+            WRITER = (
+                XmlWriter(OUT_TEXT, echo=ARGS.v)
+                if ARGS.format == "xml"
+                else NdjsonWriter(OUT_TEXT)
+            )
+        WRITER.header()
+        dir_xml(ARGS.path, WRITER, SCANNER, SNAPSHOT)
+        if SNAPSHOT is not None:
+            SNAPSHOT.save()
+        if OUT_TEXT is not None:
+            OUT_TEXT.flush()
+            OUT_TEXT.detach()
+
+    if ARGS.o:
+        stpre: str = "start" if platform == "win32" else "open"
+        os.system(f"{stpre} {OUT_PATH}")
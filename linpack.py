@@ -9,62 +9,903 @@
 @copyright Copyright 2022 Evan Elias Young. All rights reserved.
 """
 
-import queue
 import os
+import sys
+import json
+import time
+import random
+import platform
 import multiprocessing
 import argparse
-import time
-from threading import Thread
-
-PARSER = argparse.ArgumentParser("Linpack", description="Benchmarks the cpu")
-PARSER.add_argument(
-    "-t",
-    "--threads",
-    type=int,
-    default=multiprocessing.cpu_count(),
-    choices=range(1, multiprocessing.cpu_count() + 1),
-    help="Amount of threads to use in the test, default is max",
-)
-PARSER.add_argument(
-    "-r",
-    "--runtime",
-    type=int,
-    default=1,
-    choices=range(1, 11),
-    help="The time (in seconds) to run the test, default is 1",
+import statistics
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from operator import mul
+from time import perf_counter, process_time
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+
+    HAS_NUMPY: bool = True
+except ImportError:
+    HAS_NUMPY = False
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+
+BLAS_THREAD_VARS: tuple[str, ...] = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
 )
+KERNEL_NAMES: tuple[str, ...] = ("lu", "daxpy", "matmul")
+DEFAULT_SIZES: dict[str, dict[str, int]] = {
+    "python": {"lu": 120, "daxpy": 200_000, "matmul": 80},
+    "numpy": {"lu": 1000, "daxpy": 1_000_000, "matmul": 500},
+}
 
-ARGS = PARSER.parse_args()
+BOOTSTRAP_RESAMPLES: int = 2000
+CALIBRATE_TIME: float = 0.2
+WARMUP_CALLS: int = 2
+BARRIER_TIMEOUT: float = 300.0
 
+Kernel = Callable[[int, int], Callable[[], object]]
+Key = tuple[str, str, int, int]
 
-def run_op() -> int:
-    """Runs one operation (three instructions)."""
-    i: int = 0
-    while RUNNING:
-        i += 3
-    return i
 
+class Sample(NamedTuple):
+    """The combined rate of one repetition on some number of workers.
 
-if __name__ == "__main__":
-    d: str = os.path.dirname(os.path.realpath(__file__))
-    RUNNING: bool = True
-    total: int = 0
-    que: queue.Queue = queue.Queue()
-    tasks: list[Thread] = [
-        Thread(target=lambda q: q.put(run_op()), args=(que,))
-        for i in range(ARGS.threads)
+    Every worker does the same number of kernel passes, and its own wall
+    and cpu seconds are kept in worker order.
+    """
+
+    kernel: str
+    backend: str
+    size: int
+    workers: int
+    rep: int
+    gflops: float
+    calls: int = 0
+    walls: tuple[float, ...] = ()
+    cpus: tuple[float, ...] = ()
+
+
+class Timing(NamedTuple):
+    """What one worker did in one repetition."""
+
+    flops: float
+    wall: float
+    cpu: float
+
+
+class Summary(NamedTuple):
+    """The repetitions of one kernel on one number of workers.
+
+    The bounds are a bootstrap confidence interval of the mean, and cpu is
+    the workers' mean cpu time over wall time, which drops below 1 when
+    they are starved of cores.
+    """
+
+    kernel: str
+    backend: str
+    size: int
+    workers: int
+    mean: float
+    stdev: float
+    median: float
+    p95: float
+    ci_low: float
+    ci_high: float
+    cpu: float
+    efficiency: float
+
+
+class Comparison(NamedTuple):
+    """How one measurement moved against a baseline.
+
+    The change is relative, and its bounds are a bootstrap confidence
+    interval, so a regression is a drop the interval is sure of.
+    """
+
+    kernel: str
+    backend: str
+    size: int
+    workers: int
+    baseline: float
+    current: float
+    change: float
+    low: float
+    high: float
+    regression: bool
+
+
+def get_flops(kernel: str, size: int) -> float:
+    """Will return the floating point operations in one pass of a kernel.
+
+    Args:
+        kernel (string): The kernel's name.
+        size (integer): The kernel's problem size.
+
+    Returns:
+        float: The operation count.
+    """
+    if kernel == "lu":
+        return 2 / 3 * size**3 + 2 * size**2
+    if kernel == "daxpy":
+        return 2.0 * size
+    return 2.0 * size**3
+
+
+def make_matrix(size: int, seed: int) -> list[list[float]]:
+    """Will make a random square matrix.
+
+    Args:
+        size (integer): The number of rows and columns.
+        seed (integer): The random seed.
+
+    Returns:
+        list: The matrix's rows.
+    """
+    rng: random.Random = random.Random(seed)
+    return [[rng.random() - 0.5 for _ in range(size)] for _ in range(size)]
+
+
+def lu_solve(mat: list[list[float]], vec: list[float]) -> list[float]:
+    """Will solve a linear system by LU decomposition with partial pivoting.
+
+    Both arguments are overwritten, the matrix with its LU factors.
+
+    Args:
+        mat (list): The square matrix's rows.
+        vec (list): The right hand side.
+
+    Returns:
+        list: The solution.
+    """
+    size: int = len(mat)
+    for k in range(size):
+        piv: int = max(range(k, size), key=lambda i: abs(mat[i][k]))
+        if piv != k:
+            mat[k], mat[piv] = mat[piv], mat[k]
+            vec[k], vec[piv] = vec[piv], vec[k]
+        top: list[float] = mat[k]
+        tail: list[float] = top[k + 1 :]
+        inv: float = 1.0 / top[k]
+        for i in range(k + 1, size):
+            row: list[float] = mat[i]
+            fac: float = row[k] * inv
+            row[k] = fac
+            row[k + 1 :] = [r - fac * t for r, t in zip(row[k + 1 :], tail)]
+            vec[i] -= fac * vec[k]
+    ret: list[float] = [0.0] * size
+    for i in range(size - 1, -1, -1):
+        row = mat[i]
+        ret[i] = (vec[i] - sum(map(mul, row[i + 1 :], ret[i + 1 :]))) / row[i]
+    return ret
+
+
+def lu_python(size: int, seed: int) -> Callable[[], object]:
+    """Will set up a pure Python dense LU solve.
+
+    Args:
+        size (integer): The number of unknowns.
+        seed (integer): The random seed.
+
+    Returns:
+        function: Runs one solve.
+    """
+    mat: list[list[float]] = make_matrix(size, seed)
+    vec: list[float] = [sum(row) for row in mat]
+    return lambda: lu_solve([row[:] for row in mat], vec[:])
+
+
+def daxpy_python(size: int, seed: int) -> Callable[[], object]:
+    """Will set up a pure Python y = a * x + y.
+
+    Args:
+        size (integer): The vectors' length.
+        seed (integer): The random seed.
+
+    Returns:
+        function: Runs one update.
+    """
+    rng: random.Random = random.Random(seed)
+    alpha: float = rng.random()
+    xs: list[float] = [rng.random() for _ in range(size)]
+    ys: list[float] = [rng.random() for _ in range(size)]
+
+    def run() -> None:
+        ys[:] = [alpha * x + y for x, y in zip(xs, ys)]
+
+    return run
+
+
+def matmul_python(size: int, seed: int) -> Callable[[], object]:
+    """Will set up a pure Python matrix product.
+
+    Args:
+        size (integer): The number of rows and columns.
+        seed (integer): The random seed.
+
+    Returns:
+        function: Runs one product.
+    """
+    lhs: list[list[float]] = make_matrix(size, seed)
+    cols: list[tuple[float, ...]] = list(zip(*make_matrix(size, seed + 1)))
+    return lambda: [[sum(map(mul, row, col)) for col in cols] for row in lhs]
+
+
+def lu_numpy(size: int, seed: int) -> Callable[[], object]:
+    """Will set up a LAPACK dense LU solve.
+
+    Args:
+        size (integer): The number of unknowns.
+        seed (integer): The random seed.
+
+    Returns:
+        function: Runs one solve.
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    mat: "NDArray[np.float64]" = rng.random((size, size)) - 0.5
+    vec: "NDArray[np.float64]" = mat.sum(axis=1)
+    return lambda: np.linalg.solve(mat, vec)
+
+
+def daxpy_numpy(size: int, seed: int) -> Callable[[], object]:
+    """Will set up a vectorized y = a * x + y.
+
+    Args:
+        size (integer): The vectors' length.
+        seed (integer): The random seed.
+
+    Returns:
+        function: Runs one update.
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    alpha: float = float(rng.random())
+    xs: "NDArray[np.float64]" = rng.random(size)
+    ys: "NDArray[np.float64]" = rng.random(size)
+    scratch: "NDArray[np.float64]" = np.empty(size)
+
+    def run() -> None:
+        np.multiply(xs, alpha, out=scratch)
+        np.add(scratch, ys, out=ys)
+
+    return run
+
+
+def matmul_numpy(size: int, seed: int) -> Callable[[], object]:
+    """Will set up a BLAS matrix product.
+
+    Args:
+        size (integer): The number of rows and columns.
+        seed (integer): The random seed.
+
+    Returns:
+        function: Runs one product.
+    """
+    rng: np.random.Generator = np.random.default_rng(seed)
+    lhs: "NDArray[np.float64]" = rng.random((size, size))
+    rhs: "NDArray[np.float64]" = rng.random((size, size))
+    return lambda: lhs @ rhs
+
+
+KERNELS: dict[str, dict[str, Kernel]] = {
+    "python": {"lu": lu_python, "daxpy": daxpy_python, "matmul": matmul_python},
+    "numpy": {"lu": lu_numpy, "daxpy": daxpy_numpy, "matmul": matmul_numpy},
+}
+
+
+def calibrate_kernel(
+    kernel: str, backend: str, size: int, seed: int, runtime: float
+) -> int:
+    """Will find how many passes of a kernel take about a given time.
+
+    This runs in a worker process, so it only takes picklable arguments.
+
+    Args:
+        kernel (string): The kernel's name.
+        backend (string): The backend's name.
+        size (integer): The kernel's problem size.
+        seed (integer): The random seed.
+        runtime (float): The time the passes should take, in seconds.
+
+    Returns:
+        integer: The number of passes.
+    """
+    run: Callable[[], object] = KERNELS[backend][kernel](size, seed)
+    number: int = calibrate(run, min(runtime, CALIBRATE_TIME))
+    secs: float = statistics.median(time_calls(run, number, 3))
+    return max(1, round(runtime / secs))
+
+
+def run_kernel(
+    kernel: str,
+    backend: str,
+    size: int,
+    seed: int,
+    calls: int,
+    barrier: Optional[threading.Barrier] = None,
+) -> Timing:
+    """Will run a fixed number of passes of a kernel, and time them.
+
+    This runs in a worker process, so it only takes picklable arguments.
+    The kernel is set up and warmed up first, then every worker waits at
+    the barrier, so the timed passes of all workers start together.
+
+    Args:
+        kernel (string): The kernel's name.
+        backend (string): The backend's name.
+        size (integer): The kernel's problem size.
+        seed (integer): The random seed.
+        calls (integer): The number of timed passes.
+        barrier (Barrier): The barrier shared by the workers, if any.
+
+    Returns:
+        Timing: The operations done, and the wall and cpu seconds taken.
+    """
+    run: Callable[[], object] = KERNELS[backend][kernel](size, seed)
+    for _ in range(WARMUP_CALLS):
+        run()
+    if barrier is not None:
+        barrier.wait(BARRIER_TIMEOUT)
+    start: float = perf_counter()
+    start_cpu: float = process_time()
+    for _ in range(calls):
+        run()
+    return Timing(
+        calls * get_flops(kernel, size),
+        perf_counter() - start,
+        process_time() - start_cpu,
+    )
+
+
+@contextmanager
+def single_threaded_blas() -> Iterator[None]:
+    """Will keep BLAS to one thread in worker processes started meanwhile.
+
+    Otherwise every worker's BLAS starts a thread per core, and adding
+    workers measures oversubscription rather than scaling.
+    """
+    saved: dict[str, Optional[str]] = {
+        var: os.environ.get(var) for var in BLAS_THREAD_VARS
+    }
+    os.environ.update({var: "1" for var in BLAS_THREAD_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def benchmark(
+    kernels: list[str],
+    backend: str,
+    workers: int,
+    reps: int = 3,
+    runtime: float = 1.0,
+    sizes: Optional[dict[str, int]] = None,
+    calls: Optional[dict[str, int]] = None,
+) -> list[Sample]:
+    """Will run kernels on one to many worker processes at once.
+
+    Processes, unlike threads, run Python on every core at once. They are
+    spawned rather than forked, so each starts BLAS afresh on one thread.
+    Each kernel's number of passes is calibrated once to take about
+    runtime on one worker, then every measurement does exactly that much
+    work per worker, so runs are repeatable and comparable.
+
+    Args:
+        kernels (list): The kernels' names.
+        backend (string): The backend, python or numpy.
+        workers (integer): The most worker processes to run at once.
+        reps (integer): The repetitions of each measurement.
+        runtime (float): About how long each worker runs for, in seconds.
+        sizes (dictionary): The problem size of each kernel, if not default.
+        calls (dictionary): The passes of each kernel, if not calibrated.
+
+    Returns:
+        list: The samples, one per kernel, worker count and repetition.
+    """
+    sizes = {**DEFAULT_SIZES[backend], **(sizes or {})}
+    ctx: multiprocessing.context.SpawnContext = multiprocessing.get_context("spawn")
+    ret: list[Sample] = []
+    with single_threaded_blas(), ctx.Manager() as manager, ProcessPoolExecutor(
+        workers, mp_context=ctx
+    ) as pool:
+        for kernel in kernels:
+            number: int = (calls or {}).get(kernel) or pool.submit(
+                calibrate_kernel, kernel, backend, sizes[kernel], 0, runtime
+            ).result()
+            for count in range(1, workers + 1):
+                for rep in range(reps):
+                    barrier: threading.Barrier = manager.Barrier(count)
+                    timings: list[Timing] = [
+                        done.result()
+                        for done in [
+                            pool.submit(
+                                run_kernel,
+                                kernel,
+                                backend,
+                                sizes[kernel],
+                                rep * workers + i,
+                                number,
+                                barrier,
+                            )
+                            for i in range(count)
+                        ]
+                    ]
+                    ret.append(
+                        Sample(
+                            kernel,
+                            backend,
+                            sizes[kernel],
+                            count,
+                            rep,
+                            sum(t.flops / t.wall for t in timings) / 1e9,
+                            number,
+                            tuple(t.wall for t in timings),
+                            tuple(t.cpu for t in timings),
+                        )
+                    )
+    return ret
+
+
+def get_percentile(values: Sequence[float], pct: float) -> float:
+    """Will return a percentile, interpolating between the nearest values.
+
+    Args:
+        values (sequence): The values, in any order.
+        pct (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The percentile.
+    """
+    ordered: list[float] = sorted(values)
+    pos: float = (len(ordered) - 1) * pct / 100
+    low: int = int(pos)
+    high: int = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def bootstrap_ci(
+    values: Sequence[float], confidence: float = 0.95, seed: int = 0
+) -> tuple[float, float]:
+    """Will estimate a confidence interval of the mean by resampling.
+
+    Args:
+        values (sequence): The values.
+        confidence (float): The interval's confidence.
+        seed (integer): The random seed, so reports are reproducible.
+
+    Returns:
+        tuple: The interval's bounds.
+    """
+    rng: random.Random = random.Random(seed)
+    means: list[float] = [
+        statistics.fmean(rng.choices(values, k=len(values)))
+        for _ in range(BOOTSTRAP_RESAMPLES)
+    ]
+    tail: float = 50 * (1 - confidence)
+    return get_percentile(means, tail), get_percentile(means, 100 - tail)
+
+
+def bootstrap_change(
+    current: Sequence[float],
+    baseline: Sequence[float],
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> tuple[float, float, float]:
+    """Will estimate the relative change of a mean, and its interval.
+
+    Both sets of values are resampled together, so the interval reflects
+    the noise in the baseline as well as in the new values.
+
+    Args:
+        current (sequence): The new values.
+        baseline (sequence): The baseline's values.
+        confidence (float): The interval's confidence.
+        seed (integer): The random seed, so reports are reproducible.
+
+    Returns:
+        tuple: The change and its interval's bounds, as fractions.
+    """
+    rng: random.Random = random.Random(seed)
+    changes: list[float] = [
+        statistics.fmean(rng.choices(current, k=len(current)))
+        / statistics.fmean(rng.choices(baseline, k=len(baseline)))
+        - 1
+        for _ in range(BOOTSTRAP_RESAMPLES)
     ]
+    tail: float = 50 * (1 - confidence)
+    return (
+        statistics.fmean(current) / statistics.fmean(baseline) - 1,
+        get_percentile(changes, tail),
+        get_percentile(changes, 100 - tail),
+    )
+
+
+def calibrate(run: Callable[[], object], target: float) -> int:
+    """Will find how many calls of a function take about a given time.
+
+    Like timeit's autorange, the count goes up 1, 2, 5, 10, 20 and so on,
+    and the first call also warms up caches and lazy setup.
+
+    Args:
+        run (function): The function.
+        target (float): The least time a batch of calls should take.
+
+    Returns:
+        integer: The number of calls.
+    """
+    run()
+    scale: int = 1
+    while True:
+        for number in (scale, 2 * scale, 5 * scale):
+            start: float = perf_counter()
+            for _ in range(number):
+                run()
+            if perf_counter() - start >= target:
+                return number
+        scale *= 10
+
+
+def time_calls(run: Callable[[], object], number: int, repeat: int) -> list[float]:
+    """Will time batches of calls of a function.
+
+    Args:
+        run (function): The function.
+        number (integer): The calls in each batch.
+        repeat (integer): The number of batches.
+
+    Returns:
+        list: The seconds per call in each batch.
+    """
+    ret: list[float] = []
+    for _ in range(repeat):
+        start: float = perf_counter()
+        for _ in range(number):
+            run()
+        ret.append((perf_counter() - start) / number)
+    return ret
+
+
+def group_samples(samples: list[Sample]) -> dict[Key, list[float]]:
+    """Will gather the rates of each measurement's repetitions.
+
+    Args:
+        samples (list): The samples.
+
+    Returns:
+        dictionary: The rates, by kernel, backend, size and workers.
+    """
+    ret: dict[Key, list[float]] = {}
+    for sample in samples:
+        key: Key = (sample.kernel, sample.backend, sample.size, sample.workers)
+        ret.setdefault(key, []).append(sample.gflops)
+    return ret
 
-    for t in tasks:
-        t.start()
 
-    time.sleep(ARGS.runtime)
+def summarize(samples: list[Sample]) -> list[Summary]:
+    """Will combine the repetitions of each measurement.
 
-    RUNNING = False
-    time.sleep(1)
+    Scaling efficiency is the rate on n workers over n times the rate on
+    one, so perfect scaling is 1.
 
-    while not que.empty():
-        total += que.get()
+    Args:
+        samples (list): The samples.
+
+    Returns:
+        list: The summaries, in the samples' order.
+    """
+    groups: dict[Key, list[float]] = group_samples(samples)
+    usage: dict[Key, list[float]] = {}
+    for sample in samples:
+        usage.setdefault(
+            (sample.kernel, sample.backend, sample.size, sample.workers), []
+        ).extend(cpu / wall for cpu, wall in zip(sample.cpus, sample.walls) if wall)
+    ret: list[Summary] = []
+    for (kernel, backend, size, count), rates in groups.items():
+        mean: float = statistics.fmean(rates)
+        single: float = statistics.fmean(groups[(kernel, backend, size, 1)])
+        ret.append(
+            Summary(
+                kernel,
+                backend,
+                size,
+                count,
+                mean,
+                statistics.stdev(rates) if len(rates) > 1 else 0.0,
+                statistics.median(rates),
+                get_percentile(rates, 95),
+                *bootstrap_ci(rates),
+                statistics.fmean(usage[(kernel, backend, size, count)] or [0.0]),
+                mean / (count * single) if single else 0.0,
+            )
+        )
+    return ret
+
+
+def get_report(summaries: list[Summary]) -> str:
+    """Will lay out summaries as a table.
+
+    Args:
+        summaries (list): The summaries.
+
+    Returns:
+        string: The table.
+    """
+    lines: list[str] = [
+        f"{'kernel':<8}{'backend':<8}{'size':>9}{'workers':>8}{'GFLOPS':>11}"
+        f"{'median':>11}{'p95':>11}{'95% interval':>22}{'cv %':>7}{'cpu %':>7}"
+        f"{'eff %':>7}"
+    ]
+    for row in summaries:
+        lines.append(
+            f"{row.kernel:<8}{row.backend:<8}{row.size:>9}{row.workers:>8}"
+            f"{row.mean:>11.4f}{row.median:>11.4f}{row.p95:>11.4f}"
+            f"{f'{row.ci_low:.4f} .. {row.ci_high:.4f}':>22}"
+            f"{100 * row.stdev / row.mean if row.mean else 0:>7.1f}"
+            f"{100 * row.cpu:>7.1f}"
+            f"{100 * row.efficiency:>7.1f}"
+        )
+    return "\n".join(lines)
+
+
+def get_host() -> dict[str, object]:
+    """Will describe the machine the benchmark runs on.
+
+    Returns:
+        dictionary: The host's name, platform, cpu and library versions.
+    """
+    return {
+        "node": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__ if HAS_NUMPY else None,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def get_results(samples: list[Sample], runtime: float) -> dict[str, object]:
+    """Will gather a run's samples and summaries for saving as json.
+
+    Args:
+        samples (list): The samples.
+        runtime (float): The time each worker ran for, in seconds.
+
+    Returns:
+        dictionary: The host, settings, samples and summaries.
+    """
+    return {
+        "host": get_host(),
+        "runtime": runtime,
+        "samples": [sample._asdict() for sample in samples],
+        "summaries": [summary._asdict() for summary in summarize(samples)],
+    }
+
+
+def load_samples(path: str) -> list[Sample]:
+    """Will read the samples back from saved results.
+
+    Args:
+        path (string): The json file's path.
+
+    Returns:
+        list: The samples.
+    """
+    with open(path, encoding="utf-8") as inp:
+        return [Sample(**sample) for sample in json.load(inp)["samples"]]
+
+
+def get_calls(
+    samples: list[Sample], backend: str, sizes: dict[str, int]
+) -> dict[str, int]:
+    """Will find the passes each kernel did in saved samples.
+
+    Running the same passes as a baseline makes the two runs do exactly
+    the same work, rather than whatever calibration lands on this time.
+
+    Args:
+        samples (list): The saved samples.
+        backend (string): The backend the new run uses.
+        sizes (dictionary): The problem size of each kernel in the new run.
+
+    Returns:
+        dictionary: The passes, by kernel, where the backend and size match.
+    """
+    return {
+        sample.kernel: sample.calls
+        for sample in samples
+        if sample.calls
+        and sample.backend == backend
+        and sample.size == sizes.get(sample.kernel)
+    }
+
+
+def compare(
+    current: list[Sample],
+    baseline: list[Sample],
+    confidence: float = 0.95,
+    threshold: float = 0.0,
+    seed: int = 0,
+) -> list[Comparison]:
+    """Will compare the measurements two runs have in common.
+
+    Both runs are resampled together to put a confidence interval on the
+    relative change of the mean. A regression is a change whose interval
+    lies wholly below zero and whose estimate drops more than threshold.
+
+    Args:
+        current (list): The new run's samples.
+        baseline (list): The baseline's samples.
+        confidence (float): The intervals' confidence.
+        threshold (float): The smallest relative drop worth flagging.
+        seed (integer): The random seed, so reports are reproducible.
+
+    Returns:
+        list: The comparisons, in the new run's order.
+    """
+    old: dict[Key, list[float]] = group_samples(baseline)
+    ret: list[Comparison] = []
+    for key, rates in group_samples(current).items():
+        if key not in old:
+            continue
+        change, low, high = bootstrap_change(rates, old[key], confidence, seed)
+        ret.append(
+            Comparison(
+                *key,
+                statistics.fmean(old[key]),
+                statistics.fmean(rates),
+                change,
+                low,
+                high,
+                high < 0 and change < -threshold,
+            )
+        )
+    return ret
+
+
+def get_comparison_report(comparisons: list[Comparison]) -> str:
+    """Will lay out comparisons as a table.
+
+    Args:
+        comparisons (list): The comparisons.
+
+    Returns:
+        string: The table.
+    """
+    lines: list[str] = [
+        f"{'kernel':<8}{'backend':<8}{'size':>9}{'workers':>8}"
+        f"{'baseline':>11}{'current':>11}{'change %':>10}{'interval %':>17}"
+    ]
+    for row in comparisons:
+        lines.append(
+            f"{row.kernel:<8}{row.backend:<8}{row.size:>9}{row.workers:>8}"
+            f"{row.baseline:>11.4f}{row.current:>11.4f}{100 * row.change:>+10.1f}"
+            f"{f'{100 * row.low:+.1f} .. {100 * row.high:+.1f}':>17}"
+            f"{'  REGRESSION' if row.regression else ''}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser("Linpack", description="Benchmarks the cpu")
+    PARSER.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        choices=range(1, multiprocessing.cpu_count() + 1),
+        help="The most worker processes to use in the test, default is max",
+    )
+    PARSER.add_argument(
+        "-r",
+        "--runtime",
+        type=int,
+        default=1,
+        choices=range(1, 11),
+        help="About how long (in seconds) each worker runs, default is 1",
+    )
+    PARSER.add_argument(
+        "-c",
+        "--calls",
+        type=int,
+        help="The passes of every kernel, default is calibrated to the runtime"
+        " or taken from the --compare baseline",
+    )
+    PARSER.add_argument(
+        "-k",
+        "--kernel",
+        action="append",
+        choices=KERNEL_NAMES,
+        help="The kernel to run, may be repeated, default is all of them",
+    )
+    PARSER.add_argument(
+        "-b",
+        "--backend",
+        choices=tuple(KERNELS) if HAS_NUMPY else ("python",),
+        default="numpy" if HAS_NUMPY else "python",
+        help="Pure python or numpy kernels, default is numpy when installed",
+    )
+    PARSER.add_argument(
+        "-n",
+        "--size",
+        type=int,
+        help="The problem size of every kernel, default depends on the kernel",
+    )
+    PARSER.add_argument(
+        "--reps",
+        type=int,
+        default=3,
+        help="The repetitions of each measurement, default is 3",
+    )
+    PARSER.add_argument(
+        "-o",
+        "--output",
+        metavar="file",
+        help="Save the host, samples and summaries to this json file",
+    )
+    PARSER.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as json instead of a table",
+    )
+    PARSER.add_argument(
+        "--compare",
+        metavar="baseline",
+        help="Flag significant drops against this saved json, exiting with 1",
+    )
+    PARSER.add_argument(
+        "--threshold",
+        type=float,
+        default=0.0,
+        help="The smallest relative drop --compare flags, default is 0",
+    )
+    ARGS: argparse.Namespace = PARSER.parse_args()
 
-    print(ARGS.threads)
-    print(total // ARGS.runtime)
+    KERNEL_LIST: list[str] = ARGS.kernel or list(KERNEL_NAMES)
+    SIZES: dict[str, int] = {
+        k: ARGS.size or DEFAULT_SIZES[ARGS.backend][k] for k in KERNEL_LIST
+    }
+    BASELINE: list[Sample] = load_samples(ARGS.compare) if ARGS.compare else []
+    SAMPLES: list[Sample] = benchmark(
+        KERNEL_LIST,
+        ARGS.backend,
+        ARGS.threads,
+        ARGS.reps,
+        ARGS.runtime,
+        SIZES,
+        (
+            {k: ARGS.calls for k in KERNEL_LIST}
+            if ARGS.calls
+            else get_calls(BASELINE, ARGS.backend, SIZES)
+        ),
+    )
+    RESULTS: dict[str, object] = get_results(SAMPLES, ARGS.runtime)
+    if ARGS.output:
+        with open(ARGS.output, "w", encoding="utf-8") as out:
+            json.dump(RESULTS, out, indent=2)
+    print(
+        json.dumps(RESULTS, indent=2) if ARGS.json else get_report(summarize(SAMPLES))
+    )
+    if ARGS.compare:
+        COMPARISONS: list[Comparison] = compare(
+            SAMPLES, BASELINE, threshold=ARGS.threshold
+        )
+        print(
+            get_comparison_report(COMPARISONS), file=sys.stderr if ARGS.json else None
+        )
+        if any(row.regression for row in COMPARISONS):
+            sys.exit(1)
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+"""
+@file      microbench.py
+@brief     Micro-benchmarks the library functions of the other scripts.
+
+@author    Evan Elias Young
+@date      2026-10-18
+@date      2026-10-18
+@copyright Copyright 2026 Evan Elias Young. All rights reserved.
+"""
+
+import sys
+import json
+import random
+import argparse
+import statistics
+import tracemalloc
+from typing import Callable, NamedTuple, Optional
+
+import base
+import nato
+import punnet
+import ranker
+import colortools
+import rubiks_random
+import birthday_paradox
+from linpack import (
+    bootstrap_change,
+    bootstrap_ci,
+    calibrate,
+    get_host,
+    get_percentile,
+    time_calls,
+)
+
+Setup = Callable[[int], Callable[[], object]]
+
+
+class Case(NamedTuple):
+    """A function to benchmark, and the input sizes to run it at."""
+
+    name: str
+    params: tuple[int, ...]
+    setup: Setup
+
+
+class Result(NamedTuple):
+    """The timings of one case at one input size.
+
+    The times are seconds per call, one per batch, and the peak is the
+    most memory one call allocated, in bytes.
+    """
+
+    name: str
+    param: int
+    number: int
+    times: list[float]
+    peak: int
+
+
+class Comparison(NamedTuple):
+    """How one case's time per call moved against a baseline."""
+
+    name: str
+    param: int
+    baseline: float
+    current: float
+    change: float
+    low: float
+    high: float
+    regression: bool
+
+
+def setup_base_encode(bits: int) -> Callable[[], object]:
+    """Will set up encoding a number of some bits in base 64.
+
+    Args:
+        bits (integer): The number's size in bits.
+
+    Returns:
+        function: Runs one call.
+    """
+    num: int = random.Random(bits).getrandbits(bits) | 1 << (bits - 1)
+    return lambda: base.encode(num)
+
+
+def setup_base_decode(digits: int) -> Callable[[], object]:
+    """Will set up decoding a base 64 string of some digits.
+
+    Args:
+        digits (integer): The string's length.
+
+    Returns:
+        function: Runs one call.
+    """
+    rng: random.Random = random.Random(digits)
+    text: str = "".join(rng.choice(base.base64[1:]) for _ in range(digits))
+    return lambda: base.decode(text)
+
+
+def setup_color(count: int) -> Callable[[], object]:
+    """Will set up parsing colors and reading their hsl.
+
+    The caches are emptied on every call, or after calibration every hsl
+    would be a cache hit and the conversion itself would go untimed.
+
+    Args:
+        count (integer): The colors parsed per call.
+
+    Returns:
+        function: Runs one call.
+    """
+    rng: random.Random = random.Random(count)
+    texts: list[str] = [f"#{rng.getrandbits(24):06x}" for _ in range(count)]
+
+    def run() -> list[tuple[float, float, float]]:
+        colortools.COLOR_CACHE.clear()
+        colortools.HSL_CACHE.clear()
+        return [colortools.Color(text).hsl for text in texts]
+
+    return run
+
+
+def setup_nato_encode(length: int) -> Callable[[], object]:
+    """Will set up encoding text into NATO speak.
+
+    Args:
+        length (integer): The text's length.
+
+    Returns:
+        function: Runs one call.
+    """
+    rng: random.Random = random.Random(length)
+    text: str = "".join(
+        rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(length)
+    )
+    return lambda: nato.encode(text)
+
+
+def setup_nato_decode(length: int) -> Callable[[], object]:
+    """Will set up decoding NATO speak.
+
+    Args:
+        length (integer): The number of words.
+
+    Returns:
+        function: Runs one call.
+    """
+    rng: random.Random = random.Random(length)
+    text: str = " ".join(rng.choice(nato.longs) for _ in range(length))
+    return lambda: nato.decode(text)
+
+
+def setup_punnet(count: int) -> Callable[[], object]:
+    """Will set up solving punnet squares.
+
+    Args:
+        count (integer): The squares solved per call.
+
+    Returns:
+        function: Runs one call.
+    """
+    pairs: list[tuple[str, str]] = [("Aa", "Aa"), ("AA", "aa"), ("Bb", "bb")]
+    work: list[tuple[str, str]] = (pairs * count)[:count]
+    return lambda: [punnet.parse_punnet(mat, pat) for mat, pat in work]
+
+
+def setup_birthday(people: int) -> Callable[[], object]:
+    """Will set up the chance of a shared birthday.
+
+    Args:
+        people (integer): The number of people.
+
+    Returns:
+        function: Runs one call.
+    """
+    return lambda: birthday_paradox.get_percent(people)
+
+
+def setup_birthday_curve(people: int) -> Callable[[], object]:
+    """Will set up the chance of a shared hash for every group size at once.
+
+    Args:
+        people (integer): The largest number of people.
+
+    Returns:
+        function: Runs one call.
+    """
+    return lambda: birthday_paradox.curve(people, 1 << 64)
+
+
+def setup_rubiks(steps: int) -> Callable[[], object]:
+    """Will set up scrambling a cube.
+
+    Args:
+        steps (integer): The number of moves.
+
+    Returns:
+        function: Runs one call.
+    """
+    return lambda: rubiks_random.randomize(steps)
+
+
+def prefer_first(opt1: str, opt2: str, ind1: int, ind2: int) -> int:
+    """Will stand in for the ranker's prompt, picking the smaller option.
+
+    Args:
+        opt1 (string): The first option.
+        opt2 (string): The second option.
+        ind1 (integer): The first option's index.
+        ind2 (integer): The second option's index.
+
+    Returns:
+        integer: The index of the better option.
+    """
+    return ind1 if opt1 < opt2 else ind2
+
+
+def setup_ranker(count: int) -> Callable[[], object]:
+    """Will set up ranking options, answering every prompt automatically.
+
+    Args:
+        count (integer): The number of options.
+
+    Returns:
+        function: Runs one call.
+    """
+    options: list[str] = [
+        f"option {i:05}" for i in random.Random(count).sample(range(count), count)
+    ]
+
+    def run() -> list[int]:
+        prompt = ranker.get_better_option
+        ranker.get_better_option = prefer_first
+        try:
+            return ranker.rank_main(options)
+        finally:
+            ranker.get_better_option = prompt
+
+    return run
+
+
+CASES: list[Case] = [
+    Case("base.encode", (64, 1024, 16384), setup_base_encode),
+    Case("base.decode", (16, 256, 4096), setup_base_decode),
+    Case("colortools.Color", (1, 100, 10000), setup_color),
+    Case("nato.encode", (16, 1024, 65536), setup_nato_encode),
+    Case("nato.decode", (4, 256, 16384), setup_nato_decode),
+    Case("punnet.parse_punnet", (1, 100), setup_punnet),
+    Case("birthday_paradox.get_percent", (10, 50, 200), setup_birthday),
+    Case("birthday_paradox.curve", (365, 100000), setup_birthday_curve),
+    Case("rubiks_random.randomize", (20, 1000, 100000), setup_rubiks),
+    Case("ranker.rank_main", (10, 50, 200), setup_ranker),
+]
+
+
+def get_peak(run: Callable[[], object]) -> int:
+    """Will measure the most memory one call allocates at once.
+
+    This is a separate call from the timed ones, as tracing slows it down.
+
+    Args:
+        run (function): The function.
+
+    Returns:
+        integer: The peak in bytes.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        start: int = tracemalloc.get_traced_memory()[0]
+        run()
+        return tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+
+
+def run_cases(cases: list[Case], target: float = 0.1, repeat: int = 5) -> list[Result]:
+    """Will time every case at every input size.
+
+    Args:
+        cases (list): The cases.
+        target (float): The least time each batch takes, in seconds.
+        repeat (integer): The number of batches.
+
+    Returns:
+        list: The results.
+    """
+    ret: list[Result] = []
+    for case in cases:
+        for param in case.params:
+            run: Callable[[], object] = case.setup(param)
+            number: int = calibrate(run, target)
+            ret.append(
+                Result(
+                    case.name,
+                    param,
+                    number,
+                    time_calls(run, number, repeat),
+                    get_peak(run),
+                )
+            )
+    return ret
+
+
+def get_report(results: list[Result]) -> str:
+    """Will lay out results as a table, in microseconds per call.
+
+    Args:
+        results (list): The results.
+
+    Returns:
+        string: The table.
+    """
+    lines: list[str] = [
+        f"{'case':<30}{'size':>8}{'calls':>9}{'median us':>13}{'p95 us':>13}"
+        f"{'95% interval us':>24}{'peak KiB':>11}"
+    ]
+    for row in results:
+        low, high = bootstrap_ci(row.times)
+        lines.append(
+            f"{row.name:<30}{row.param:>8}{row.number:>9}"
+            f"{1e6 * statistics.median(row.times):>13.3f}"
+            f"{1e6 * get_percentile(row.times, 95):>13.3f}"
+            f"{f'{1e6 * low:.3f} .. {1e6 * high:.3f}':>24}"
+            f"{row.peak / 1024:>11.1f}"
+        )
+    return "\n".join(lines)
+
+
+def load_results(path: str) -> list[Result]:
+    """Will read results back from a saved json file.
+
+    Args:
+        path (string): The json file's path.
+
+    Returns:
+        list: The results.
+    """
+    with open(path, encoding="utf-8") as inp:
+        return [Result(**result) for result in json.load(inp)["results"]]
+
+
+def compare(
+    current: list[Result], baseline: list[Result], threshold: float = 0.0
+) -> list[Comparison]:
+    """Will compare the cases two runs have in common.
+
+    A regression is a rise in time per call whose confidence interval lies
+    wholly above zero and whose estimate rises more than threshold.
+
+    Args:
+        current (list): The new run's results.
+        baseline (list): The baseline's results.
+        threshold (float): The smallest relative slowdown worth flagging.
+
+    Returns:
+        list: The comparisons, in the new run's order.
+    """
+    old: dict[tuple[str, int], Result] = {(r.name, r.param): r for r in baseline}
+    ret: list[Comparison] = []
+    for row in current:
+        before: Optional[Result] = old.get((row.name, row.param))
+        if before is None:
+            continue
+        change, low, high = bootstrap_change(row.times, before.times)
+        ret.append(
+            Comparison(
+                row.name,
+                row.param,
+                statistics.fmean(before.times),
+                statistics.fmean(row.times),
+                change,
+                low,
+                high,
+                low > 0 and change > threshold,
+            )
+        )
+    return ret
+
+
+def get_comparison_report(comparisons: list[Comparison]) -> str:
+    """Will lay out comparisons as a table, in microseconds per call.
+
+    Args:
+        comparisons (list): The comparisons.
+
+    Returns:
+        string: The table.
+    """
+    lines: list[str] = [
+        f"{'case':<30}{'size':>8}{'baseline us':>13}{'current us':>13}"
+        f"{'change %':>10}{'interval %':>17}"
+    ]
+    for row in comparisons:
+        lines.append(
+            f"{row.name:<30}{row.param:>8}{1e6 * row.baseline:>13.3f}"
+            f"{1e6 * row.current:>13.3f}{100 * row.change:>+10.1f}"
+            f"{f'{100 * row.low:+.1f} .. {100 * row.high:+.1f}':>17}"
+            f"{'  REGRESSION' if row.regression else ''}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description="Micro-benchmarks the scripts")
+    PARSER.add_argument(
+        "-k",
+        "--filter",
+        metavar="text",
+        help="Only run the cases whose name contains this",
+    )
+    PARSER.add_argument(
+        "--target",
+        type=float,
+        default=0.1,
+        help="The least time (in seconds) each batch of calls takes",
+    )
+    PARSER.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="The number of batches of each case, default is 5",
+    )
+    PARSER.add_argument(
+        "-o",
+        "--output",
+        metavar="file",
+        help="Save the host and results to this json file",
+    )
+    PARSER.add_argument(
+        "--json",
+        action="store_true",
+        help="Print the results as json instead of a table",
+    )
+    PARSER.add_argument(
+        "--compare",
+        metavar="baseline",
+        help="Flag significant slowdowns against this saved json, exiting with 1",
+    )
+    PARSER.add_argument(
+        "--threshold",
+        type=float,
+        default=0.0,
+        help="The smallest relative slowdown --compare flags, default is 0",
+    )
+    ARGS: argparse.Namespace = PARSER.parse_args()
+
+    RESULTS: list[Result] = run_cases(
+        [c for c in CASES if not ARGS.filter or ARGS.filter in c.name],
+        ARGS.target,
+        ARGS.repeat,
+    )
+    REPORT: dict[str, object] = {
+        "host": get_host(),
+        "results": [r._asdict() for r in RESULTS],
+    }
+    if ARGS.output:
+        with open(ARGS.output, "w", encoding="utf-8") as out:
+            json.dump(REPORT, out, indent=2)
+    print(json.dumps(REPORT, indent=2) if ARGS.json else get_report(RESULTS))
+    if ARGS.compare:
+        COMPARISONS: list[Comparison] = compare(
+            RESULTS, load_results(ARGS.compare), ARGS.threshold
+        )
+        print(
+            get_comparison_report(COMPARISONS), file=sys.stderr if ARGS.json else None
+        )
+        if any(row.regression for row in COMPARISONS):
+            sys.exit(1)
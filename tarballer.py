@@ -9,52 +9,1339 @@
 @copyright Copyright 2022 Evan Elias Young. All rights reserved.
 """
 
+import io
 import tarfile
-import sys
 import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import argparse
+import bz2
+import gzip
+import lzma
+import zlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from lzma import PRESET_EXTREME
+from types import TracebackType
+from typing import BinaryIO, Callable, Iterable, NamedTuple, Optional, Protocol
 
+try:
+    import zstandard
 
-def compress_folder(directory: str, name: str) -> None:
-    """Compresses a folder to a .tar.xz.
+    HAS_ZSTD: bool = True
+except ImportError:
+    HAS_ZSTD = False
+
+XZ_DICT_SIZES: tuple[int, ...] = (
+    1 << 18,
+    1 << 20,
+    1 << 21,
+    1 << 22,
+    1 << 22,
+    1 << 23,
+    1 << 23,
+    1 << 24,
+    1 << 25,
+    1 << 26,
+)
+MIN_BLOCK_SIZE: int = 1 << 20
+STREAM_CHUNK: int = 1 << 16
+INDEX_SUFFIX: str = ".idx"
+MANIFEST_SUFFIX: str = ".manifest"
+SAMPLE_FILES: int = 16
+SAMPLE_SIZE: int = 1 << 18
+STORE_MIN_SIZE: int = 1 << 16
+COMPRESSED_SUFFIXES: frozenset[str] = frozenset(
+    (
+        ".7z",
+        ".aac",
+        ".avi",
+        ".br",
+        ".bz2",
+        ".docx",
+        ".flac",
+        ".gif",
+        ".gz",
+        ".heic",
+        ".jar",
+        ".jpeg",
+        ".jpg",
+        ".lz4",
+        ".mkv",
+        ".mov",
+        ".mp3",
+        ".mp4",
+        ".ogg",
+        ".png",
+        ".pptx",
+        ".rar",
+        ".tgz",
+        ".webm",
+        ".webp",
+        ".woff2",
+        ".xlsx",
+        ".xz",
+        ".zip",
+        ".zst",
+    )
+)
+
+
+class Decompressor(Protocol):
+    """One-shot decompressor state, ending at the end of a stream."""
+
+    @property
+    def eof(self) -> bool:
+        """Whether the end of the stream was reached."""
+
+    @property
+    def unused_data(self) -> bytes:
+        """The data found after the end of the stream."""
+
+    def decompress(self, data: bytes, /) -> bytes:
+        """Will decompress more of the stream."""
+
+
+class Reader(Protocol):
+    """A decompressing file that reads across concatenated streams."""
+
+    def read(self, size: int = -1, /) -> bytes:
+        """Will read up to size decompressed bytes."""
+
+    def seek(self, pos: int, /) -> int:
+        """Will move to an uncompressed position."""
+
+    def close(self) -> None:
+        """Will close the reader, but not the file under it."""
+
+
+class Codec(NamedTuple):
+    """A compression format that can be written as independent blocks.
+
+    Every supported format may be concatenated, so blocks compressed on
+    their own still make one ordinary file. The store level is what
+    already compressed members are written with.
+    """
+
+    name: str
+    suffix: str
+    magic: bytes
+    default: int
+    store: int
+    levels: tuple[int, ...]
+    compress: Callable[[bytes, int], bytes]
+    reader: Callable[[BinaryIO], Reader]
+    decompressor: Callable[[], Decompressor]
+    block_size: Callable[[int], int]
+
+
+class Member(NamedTuple):
+    """Where one member sits in the uncompressed tar stream.
+
+    The kind is d for a folder, l for a hard link, and f for the rest.
+    """
+
+    name: str
+    kind: str
+    offset: int
+    offset_data: int
+    size: int
+
+
+class ManifestEntry(NamedTuple):
+    """One file of a snapshot, and which archive holds its contents."""
+
+    size: int
+    mtime_ns: int
+    sha256: str
+    archive: str
+    member: str
+
+
+class Manifest(NamedTuple):
+    """The files of a snapshot, which may live in earlier archives.
+
+    Archives are named relative to the manifest's folder.
+    """
+
+    base: Optional[str]
+    files: dict[str, ManifestEntry]
+
+
+class ArchiveIndex(NamedTuple):
+    """The blocks and members of an archive, for random access.
+
+    Each block is its uncompressed offset, compressed offset and
+    compressed length. The archive's size is kept to notice a stale index.
+    """
+
+    archive_size: int
+    blocks: list[tuple[int, int, int]]
+    members: list[Member]
+
+
+def parse_preset(text: str) -> int:
+    """Will parse an xz preset written like the xz tool's, such as 6 or 9e.
+
+    Args:
+        text (string): The level, optionally followed by e for extreme.
+
+    Returns:
+        integer: The lzma preset.
+    """
+    extreme: bool = text.endswith("e")
+    level: int = int(text[:-1] if extreme else text)
+    if not 0 <= level <= 9:
+        raise ValueError(f"xz presets run from 0 to 9, not {level}")
+    return level | PRESET_EXTREME if extreme else level
+
+
+def get_block_size(preset: int) -> int:
+    """Will return the uncompressed size of each parallel xz block.
+
+    Like xz's own threaded mode this is three times the preset's
+    dictionary, as smaller blocks cost ratio and larger ones parallelism.
+
+    Args:
+        preset (integer): The lzma preset.
+
+    Returns:
+        integer: The block size in bytes.
+    """
+    return max(MIN_BLOCK_SIZE, 3 * XZ_DICT_SIZES[preset & ~PRESET_EXTREME])
+
+
+def get_fixed_block_size(level: int) -> int:
+    """Will return the block size of formats whose window is small.
+
+    Args:
+        level (integer): The compression level, which does not matter.
+
+    Returns:
+        integer: The block size in bytes.
+    """
+    return MIN_BLOCK_SIZE
+
+
+def get_zst_block_size(level: int) -> int:
+    """Will return the block size for zstd, whose window grows with level.
+
+    Args:
+        level (integer): The zstd level.
+
+    Returns:
+        integer: The block size in bytes.
+    """
+    return MIN_BLOCK_SIZE << (2 if level < 10 else 4)
+
+
+def gz_compress(data: bytes, level: int) -> bytes:
+    """Will compress a block as one gzip member.
+
+    Args:
+        data (bytes): The block.
+        level (integer): The level, from 0 to store up to 9.
+
+    Returns:
+        bytes: The gzip member.
+    """
+    return gzip.compress(data, level, mtime=0)
+
+
+def gz_reader(fileobj: BinaryIO) -> Reader:
+    """Will open a gzip file for reading.
+
+    Args:
+        fileobj (BinaryIO): The compressed file.
+
+    Returns:
+        Reader: The decompressing reader.
+    """
+    return gzip.GzipFile(fileobj=fileobj, mode="rb")
+
+
+def gz_decompressor() -> Decompressor:
+    """Will start decompressing one gzip member.
+
+    Returns:
+        Decompressor: The decompressor.
+    """
+    return zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+
+def bz2_compress(data: bytes, level: int) -> bytes:
+    """Will compress a block as one bzip2 stream.
+
+    Args:
+        data (bytes): The block.
+        level (integer): The level, from 1 up to 9.
+
+    Returns:
+        bytes: The bzip2 stream.
+    """
+    return bz2.compress(data, level)
+
+
+def xz_compress(data: bytes, level: int) -> bytes:
+    """Will compress a block as one xz stream.
+
+    Args:
+        data (bytes): The block.
+        level (integer): The lzma preset.
+
+    Returns:
+        bytes: The xz stream.
+    """
+    return lzma.compress(data, format=lzma.FORMAT_XZ, preset=level)
+
+
+def zst_compress(data: bytes, level: int) -> bytes:
+    """Will compress a block as one zstd frame.
+
+    Args:
+        data (bytes): The block.
+        level (integer): The level, from 1 up to 22.
+
+    Returns:
+        bytes: The zstd frame.
+    """
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def zst_reader(fileobj: BinaryIO) -> Reader:
+    """Will open a zstd file for reading.
+
+    Args:
+        fileobj (BinaryIO): The compressed file.
+
+    Returns:
+        Reader: The decompressing reader.
+    """
+    return zstandard.ZstdDecompressor().stream_reader(
+        fileobj, read_across_frames=True, closefd=False
+    )
+
+
+def zst_decompressor() -> Decompressor:
+    """Will start decompressing one zstd frame.
+
+    Returns:
+        Decompressor: The decompressor.
+    """
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+CODECS: dict[str, Codec] = {
+    "gz": Codec(
+        "gz",
+        ".gz",
+        b"\x1f\x8b",
+        6,
+        0,
+        (1, 6, 9),
+        gz_compress,
+        gz_reader,
+        gz_decompressor,
+        get_fixed_block_size,
+    ),
+    "bz2": Codec(
+        "bz2",
+        ".bz2",
+        b"BZh",
+        9,
+        1,
+        (1, 9),
+        bz2_compress,
+        bz2.BZ2File,
+        bz2.BZ2Decompressor,
+        get_fixed_block_size,
+    ),
+    "xz": Codec(
+        "xz",
+        ".xz",
+        b"\xfd7zXZ\x00",
+        PRESET_EXTREME,
+        0,
+        (0, 3, 6, 9 | PRESET_EXTREME),
+        xz_compress,
+        lzma.LZMAFile,
+        lzma.LZMADecompressor,
+        get_block_size,
+    ),
+}
+if HAS_ZSTD:
+    CODECS["zst"] = Codec(
+        "zst",
+        ".zst",
+        b"\x28\xb5\x2f\xfd",
+        3,
+        1,
+        (1, 3, 9, 19),
+        zst_compress,
+        zst_reader,
+        zst_decompressor,
+        get_zst_block_size,
+    )
+
+
+def parse_level(codec: Codec, text: Optional[str]) -> int:
+    """Will parse a compression level, or give the codec's default.
+
+    A level is only accepted if the codec's library accepts it, so this
+    can be used as an argparse type.
+
+    Args:
+        codec (Codec): The codec.
+        text (string): The level, which for xz may end in e for extreme.
+
+    Returns:
+        integer: The level.
+
+    Raises:
+        ArgumentTypeError: If the level is not valid for the codec.
+    """
+    if text is None:
+        return codec.default
+    try:
+        level: int = parse_preset(text) if codec.name == "xz" else int(text)
+        codec.compress(b"", level)
+    except (ValueError, zlib.error, lzma.LZMAError):
+        raise argparse.ArgumentTypeError(
+            f"{text!r} is not a {codec.name} level"
+        ) from None
+    return level
+
+
+def detect_codec(path: str) -> Codec:
+    """Will tell which codec compressed a file from its first bytes.
+
+    Args:
+        path (string): The file's path.
+
+    Returns:
+        Codec: The file's codec.
+    """
+    with open(path, "rb") as inp:
+        head: bytes = inp.read(8)
+    for codec in CODECS.values():
+        if head.startswith(codec.magic):
+            return codec
+    raise tarfile.ReadError(f"{path} is not compressed with a known codec")
+
+
+def is_compressed(name: str) -> bool:
+    """Will guess whether a file's contents are already compressed.
+
+    Args:
+        name (string): The file's name.
+
+    Returns:
+        boolean: Whether the name has a compressed format's suffix.
+    """
+    return os.path.splitext(name)[1].lower() in COMPRESSED_SUFFIXES
+
+
+def get_sample(top: str) -> bytes:
+    """Will read a sample of the files in a folder that are not compressed.
+
+    The sample takes the start of files spread evenly over the folder.
+
+    Args:
+        top (string): The folder.
+
+    Returns:
+        bytes: The sample.
+    """
+    paths: list[str] = [
+        os.path.join(root, fil)
+        for root, _, fils in os.walk(top)
+        for fil in fils
+        if not is_compressed(fil)
+    ]
+    ret: bytearray = bytearray()
+    for path in paths[:: max(1, len(paths) // SAMPLE_FILES)][:SAMPLE_FILES]:
+        try:
+            with open(path, "rb") as inp:
+                ret += inp.read(SAMPLE_SIZE)
+        except OSError:
+            continue
+    return bytes(ret)
+
+
+def choose_codec(
+    top: str, speed: float = 20.0, ratio: Optional[float] = None
+) -> tuple[Codec, int]:
+    """Will pick a codec and level by compressing a sample of a folder.
+
+    With a target ratio this picks the fastest level that reaches it,
+    otherwise the best ratio that still compresses at the target speed.
+    Either way the closest level is used if none reaches the target.
+
+    Args:
+        top (string): The folder.
+        speed (float): The target speed of one thread, in MB/s.
+        ratio (float): The target compression ratio, if any.
+
+    Returns:
+        tuple: The codec and level.
+    """
+    sample: bytes = get_sample(top)
+    if not sample:
+        return CODECS["gz"], CODECS["gz"].default
+    trials: list[tuple[float, float, Codec, int]] = []
+    for codec in CODECS.values():
+        for level in codec.levels:
+            start: float = time.perf_counter()
+            size: int = len(codec.compress(sample, level))
+            elapsed: float = max(time.perf_counter() - start, 1e-9)
+            trials.append(
+                (len(sample) / 1e6 / elapsed, len(sample) / size, codec, level)
+            )
+    if ratio is not None:
+        hits = [t for t in trials if t[1] >= ratio]
+        best = (
+            max(hits, key=lambda t: t[0]) if hits else max(trials, key=lambda t: t[1])
+        )
+    else:
+        hits = [t for t in trials if t[0] >= speed]
+        best = (
+            max(hits, key=lambda t: t[1]) if hits else max(trials, key=lambda t: t[0])
+        )
+    return best[2], best[3]
+
+
+class ParallelWriter:
+    """A write-only file that compresses its blocks on a pool of threads.
+
+    Each block becomes an independent stream, and every codec's streams
+    may be concatenated, so the output is an ordinary compressed file that
+    stock tools accept. The codecs release the GIL while they compress, so
+    the blocks really are compressed at once. At most two blocks per job
+    are in flight, which bounds memory use.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        jobs: int,
+        codec: Codec,
+        level: int,
+    ) -> None:
+        self.fileobj: BinaryIO = fileobj
+        self.codec: Codec = codec
+        self.level: int = level
+        self.block_size: int = codec.block_size(level)
+        self._pool: ThreadPoolExecutor = ThreadPoolExecutor(jobs)
+        self._limit: int = 2 * jobs
+        self._pending: deque[tuple[int, Future[bytes]]] = deque()
+        self._buffer: bytearray = bytearray()
+        self._pos: int = 0
+        self._block_pos: int = 0
+        self._out_pos: int = 0
+        self.blocks: list[tuple[int, int, int]] = []
+
+    def __enter__(self) -> "ParallelWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        trace: Optional[TracebackType],
+    ) -> None:
+        if exc is None:
+            self.close()
+            return
+        for _, pending in self._pending:
+            pending.cancel()
+        self._pool.shutdown()
+
+    def _submit(self, block: bytes) -> None:
+        """Will queue a block for compression, writing out finished ones.
+
+        Args:
+            block (bytes): The uncompressed block.
+        """
+        self._pending.append(
+            (
+                self._block_pos,
+                self._pool.submit(self.codec.compress, block, self.level),
+            )
+        )
+        self._block_pos += len(block)
+        while len(self._pending) >= self._limit:
+            self._write_block()
+
+    def _write_block(self) -> None:
+        """Will write out the oldest block once it is compressed."""
+        start, pending = self._pending.popleft()
+        data: bytes = pending.result()
+        self.fileobj.write(data)
+        self.blocks.append((start, self._out_pos, len(data)))
+        self._out_pos += len(data)
+
+    def set_level(self, level: int) -> None:
+        """Will compress what follows at another level, in its own blocks.
+
+        Args:
+            level (integer): The level.
+        """
+        if level == self.level:
+            return
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        self.level = level
+        self.block_size = self.codec.block_size(level)
+
+    def write(self, data: bytes) -> int:
+        """Will add data to the stream.
+
+        Args:
+            data (bytes): The uncompressed data.
+
+        Returns:
+            integer: The number of bytes written.
+        """
+        self._buffer += data
+        self._pos += len(data)
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[: self.block_size]))
+            del self._buffer[: self.block_size]
+        return len(data)
+
+    def tell(self) -> int:
+        """Will return the uncompressed position.
+
+        Returns:
+            integer: The number of bytes written so far.
+        """
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        raise io.UnsupportedOperation("read")
+
+    def seek(self, pos: int) -> int:
+        raise io.UnsupportedOperation("seek")
+
+    def close(self) -> None:
+        """Will compress what is left and wait for every block."""
+        if self._buffer or not self._pos:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self._write_block()
+        self._pool.shutdown()
+
+
+class BlockScanner:
+    """A read-only file that decompresses an archive and notes its blocks.
+
+    Each stream in the archive counts as one block, so reading an archive
+    through this once is enough to index one written by any tool.
+    """
+
+    def __init__(self, fileobj: BinaryIO, codec: Codec) -> None:
+        self.fileobj: BinaryIO = fileobj
+        self.codec: Codec = codec
+        self.blocks: list[tuple[int, int, int]] = []
+        self._dec: Optional[Decompressor] = None
+        self._raw: bytes = b""
+        self._out: bytearray = bytearray()
+        self._fed: int = 0
+        self._in_pos: int = 0
+        self._start: int = 0
+        self._pos: int = 0
+
+    def _fill(self) -> bool:
+        """Will decompress the next chunk of the archive.
+
+        Returns:
+            boolean: Whether there was anything left to read.
+        """
+        if not self._raw:
+            self._raw = self.fileobj.read(STREAM_CHUNK)
+            if not self._raw:
+                if self._dec is not None:
+                    raise EOFError("Compressed file ended before the end of a block")
+                return False
+        if self._dec is None:
+            data: bytes = self._raw.lstrip(b"\0")
+            self._in_pos += len(self._raw) - len(data)
+            self._raw = data
+            if not data:
+                return True
+            self._dec = self.codec.decompressor()
+            self._fed = 0
+            self._start = self._pos + len(self._out)
+        self._fed += len(self._raw)
+        self._out += self._dec.decompress(self._raw)
+        self._raw = b""
+        if self._dec.eof:
+            self._raw = self._dec.unused_data
+            used: int = self._fed - len(self._raw)
+            self.blocks.append((self._start, self._in_pos, used))
+            self._in_pos += used
+            self._dec = None
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        """Will read decompressed data.
+
+        Args:
+            size (integer): The most bytes to read, or -1 for all of them.
+
+        Returns:
+            bytes: The data, empty at the end of the archive.
+        """
+        while (size < 0 or len(self._out) < size) and self._fill():
+            pass
+        size = len(self._out) if size < 0 else min(size, len(self._out))
+        ret: bytes = bytes(self._out[:size])
+        del self._out[:size]
+        self._pos += size
+        return ret
+
+    def write(self, data: bytes) -> int:
+        raise io.UnsupportedOperation("write")
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int) -> int:
+        raise io.UnsupportedOperation("seek")
+
+    def close(self) -> None:
+        pass
+
+
+class BlockReader:
+    """A read-only, seekable file over the uncompressed tar stream.
+
+    A seek into another block starts decompressing from that block's own
+    stream, so reaching any member only costs the blocks it sits in.
+    """
+
+    def __init__(
+        self, path: str, blocks: list[tuple[int, int, int]], codec: Codec
+    ) -> None:
+        self._raw: BinaryIO = open(path, "rb")
+        self.codec: Codec = codec
+        self.blocks: list[tuple[int, int, int]] = blocks
+        self._starts: list[int] = [block[0] for block in blocks]
+        self._stream: Optional[Reader] = None
+        self._stream_start: int = 0
+        self._stream_pos: int = 0
+        self._pos: int = 0
+
+    def __enter__(self) -> "BlockReader":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        trace: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def _block_of(self, pos: int) -> int:
+        """Will return which block holds a position.
+
+        Args:
+            pos (integer): The uncompressed position.
+
+        Returns:
+            integer: The block's index.
+        """
+        return max(0, bisect_right(self._starts, pos) - 1)
+
+    def read(self, size: int = -1) -> bytes:
+        """Will read from the current position.
+
+        Args:
+            size (integer): The most bytes to read, or -1 for all of them.
+
+        Returns:
+            bytes: The data, empty at the end of the archive.
+        """
+        block: int = self._block_of(self._pos)
+        if (
+            self._stream is None
+            or self._pos < self._stream_pos
+            or block != self._block_of(self._stream_pos)
+        ):
+            if self._stream is not None:
+                self._stream.close()
+            start, offset, _ = self.blocks[block]
+            self._raw.seek(offset)
+            self._stream = self.codec.reader(self._raw)
+            self._stream_start = self._stream_pos = start
+        if self._pos > self._stream_pos:
+            self._stream.seek(self._pos - self._stream_start)
+        ret: bytes = self._stream.read(size)
+        self._pos += len(ret)
+        self._stream_pos = self._pos
+        return ret
+
+    def write(self, data: bytes) -> int:
+        raise io.UnsupportedOperation("write")
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        self._pos = pos + (self._pos if whence == io.SEEK_CUR else 0)
+        return self._pos
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+        self._raw.close()
+
+
+def get_members(infos: Iterable[tarfile.TarInfo]) -> list[Member]:
+    """Will list where a tarball's members are.
+
+    Args:
+        infos (iterable): The tarball's members.
+
+    Returns:
+        list: The members, in archive order.
+    """
+    return [
+        Member(
+            info.name,
+            "d" if info.isdir() else "l" if info.islnk() else "f",
+            info.offset,
+            info.offset_data,
+            info.size,
+        )
+        for info in infos
+    ]
+
+
+def add_indexed(
+    tar: tarfile.TarFile,
+    name: str,
+    before: Optional[Callable[[tarfile.TarInfo], bool]] = None,
+) -> list[Member]:
+    """Will add a path to a tarball open for writing, noting its members.
+
+    Tarfile only records offsets when reading, so each header's offset is
+    taken as it is added, and the data sits just before the next header.
+
+    Args:
+        tar (TarFile): The tarball.
+        name (string): The path to add.
+        before (function): Called with each member just before it is added,
+            returning whether to add it.
+
+    Returns:
+        list: The members added, in archive order.
+    """
+    added: list[tuple[tarfile.TarInfo, int]] = []
+
+    def note(info: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        if before is not None and not before(info):
+            return None
+        added.append((info, tar.offset))
+        return info
+
+    tar.add(name, filter=note)
+    ends: list[int] = [offset for _, offset in added[1:]] + [tar.offset]
+    for (info, offset), end in zip(added, ends):
+        info.offset = offset
+        info.offset_data = end
+        if info.isreg():
+            info.offset_data -= -(-info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+    return get_members(info for info, _ in added)
+
+
+def write_index(archive: str, index: ArchiveIndex) -> None:
+    """Will save an archive's index next to it.
+
+    Args:
+        archive (string): The archive's path.
+        index (ArchiveIndex): The archive's index.
+    """
+    with open(f"{archive}{INDEX_SUFFIX}", "w", encoding="utf-8") as out:
+        json.dump(index._asdict(), out, separators=(",", ":"))
+
+
+def read_index(archive: str) -> Optional[ArchiveIndex]:
+    """Will load an archive's saved index, if it has a current one.
+
+    Args:
+        archive (string): The archive's path.
+
+    Returns:
+        ArchiveIndex: The index, or None if it is missing or stale.
+    """
+    try:
+        with open(f"{archive}{INDEX_SUFFIX}", encoding="utf-8") as inp:
+            raw = json.load(inp)
+    except (OSError, ValueError):
+        return None
+    size: int = os.path.getsize(archive)
+    if raw["archive_size"] != size:
+        return None
+    return ArchiveIndex(
+        size,
+        [(start, offset, length) for start, offset, length in raw["blocks"]],
+        [Member(*member) for member in raw["members"]],
+    )
+
+
+def build_index(archive: str) -> ArchiveIndex:
+    """Will index an archive by reading it through once.
+
+    Args:
+        archive (string): The archive's path.
+
+    Returns:
+        ArchiveIndex: The archive's index.
+    """
+    with open(archive, "rb") as inp:
+        scanner: BlockScanner = BlockScanner(inp, detect_codec(archive))
+        with tarfile.open(fileobj=scanner, mode="r|") as tar:
+            members: list[Member] = get_members(tar)
+        while scanner.read(STREAM_CHUNK):
+            pass
+    return ArchiveIndex(os.path.getsize(archive), scanner.blocks, members)
+
+
+def get_index(archive: str) -> ArchiveIndex:
+    """Will load an archive's index, building and saving it if needed.
+
+    Args:
+        archive (string): The archive's path.
+
+    Returns:
+        ArchiveIndex: The archive's index.
+    """
+    index: Optional[ArchiveIndex] = read_index(archive)
+    if index is None:
+        index = build_index(archive)
+        write_index(archive, index)
+    return index
+
+
+def _extract_run(
+    archive: str,
+    blocks: list[tuple[int, int, int]],
+    codec: Codec,
+    run: list[Member],
+    path: str,
+) -> None:
+    """Will extract members that start in the same block.
+
+    Args:
+        archive (string): The archive's path.
+        blocks (list): The archive's blocks.
+        codec (Codec): The archive's codec.
+        run (list): The members, in archive order.
+        path (string): Where to extract them.
+    """
+    with BlockReader(archive, blocks, codec) as reader:
+        reader.seek(run[0].offset)
+        with tarfile.open(fileobj=reader, mode="r:") as tar:
+            for member in run:
+                reader.seek(member.offset)
+                tar.extract(tarfile.TarInfo.fromtarfile(tar), path)
+
+
+def extract_members(
+    archive: str,
+    names: Optional[Iterable[str]] = None,
+    path: str = ".",
+    jobs: int = 1,
+) -> None:
+    """Will extract members by decompressing only the blocks they sit in.
+
+    Members that start in different blocks are extracted at once. Folders
+    are made up front and get their attributes last, as extractall does,
+    and hard links wait until everything they could point to exists.
+
+    Args:
+        archive (string): The archive's path.
+        names (iterable): The members' names, or None for all of them.
+        path (string): Where to extract them.
+        jobs (integer): The number of threads extracting at once.
+    """
+    index: ArchiveIndex = get_index(archive)
+    codec: Codec = detect_codec(archive)
+    members: list[Member] = index.members
+    if names is not None:
+        by_name: dict[str, Member] = {m.name: m for m in members}
+        try:
+            members = sorted(
+                [by_name[name.rstrip("/")] for name in names], key=lambda m: m.offset
+            )
+        except KeyError as err:
+            raise KeyError(f"filename {err.args[0]!r} not found") from None
+    if not members:
+        return
+
+    dirs: list[Member] = [m for m in members if m.kind == "d"]
+    for folder in {os.path.dirname(m.name) for m in members} | {m.name for m in dirs}:
+        os.makedirs(os.path.join(path, folder), exist_ok=True)
+
+    starts: list[int] = [block[0] for block in index.blocks]
+    runs: dict[int, list[Member]] = {}
+    for member in members:
+        if member.kind == "f":
+            runs.setdefault(bisect_right(starts, member.offset), []).append(member)
+    with ThreadPoolExecutor(jobs) as pool:
+        for done in [
+            pool.submit(_extract_run, archive, index.blocks, codec, run, path)
+            for run in runs.values()
+        ]:
+            done.result()
+
+    links: list[Member] = [m for m in members if m.kind == "l"]
+    dirs.sort(key=lambda m: m.name, reverse=True)
+    for run in (links, dirs):
+        if run:
+            _extract_run(archive, index.blocks, codec, run, path)
+
+
+def hash_file(path: str) -> str:
+    """Will hash a file's contents.
+
+    Args:
+        path (string): The file's path.
+
+    Returns:
+        string: The hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as inp:
+        while chunk := inp.read(MIN_BLOCK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(archive: str, manifest: Manifest) -> None:
+    """Will save an archive's manifest next to it.
+
+    Args:
+        archive (string): The archive's path.
+        manifest (Manifest): The archive's manifest.
+    """
+    with open(f"{archive}{MANIFEST_SUFFIX}", "w", encoding="utf-8") as out:
+        json.dump(
+            {"base": manifest.base, "files": manifest.files},
+            out,
+            separators=(",", ":"),
+        )
+
+
+def read_manifest(archive: str) -> Optional[Manifest]:
+    """Will load an archive's manifest, if it has one.
+
+    Args:
+        archive (string): The archive's path.
+
+    Returns:
+        Manifest: The manifest, or None if it is missing.
+    """
+    try:
+        with open(f"{archive}{MANIFEST_SUFFIX}", encoding="utf-8") as inp:
+            raw = json.load(inp)
+    except (OSError, ValueError):
+        return None
+    return Manifest(
+        raw["base"],
+        {path: ManifestEntry(*entry) for path, entry in raw["files"].items()},
+    )
+
+
+def restore(archive: str, path: str = ".", jobs: int = 1) -> None:
+    """Will extract a snapshot, pulling unchanged files from earlier archives.
+
+    Only the members a snapshot refers to are read from earlier archives,
+    through their indexes, and they get the mtimes the snapshot saw. The
+    snapshot's own archive is extracted last, so its folders get their
+    attributes once everything is in place.
+
+    Args:
+        archive (string): The snapshot's archive.
+        path (string): Where to extract it.
+        jobs (integer): The number of threads extracting at once.
+    """
+    manifest: Optional[Manifest] = read_manifest(archive)
+    folder: str = os.path.dirname(archive)
+    here: str = os.path.basename(archive)
+    groups: dict[str, list[tuple[str, ManifestEntry]]] = {}
+    for name, entry in (manifest.files.items() if manifest else ()):
+        if entry.archive != here:
+            groups.setdefault(entry.archive, []).append((name, entry))
+    for other, entries in groups.items():
+        other = os.path.join(folder, other)
+        extract_members(
+            other, [e.member for name, e in entries if name == e.member], path, jobs
+        )
+        moved: list[tuple[str, ManifestEntry]] = [
+            (name, e) for name, e in entries if name != e.member
+        ]
+        if not moved:
+            continue
+        scratch: str = tempfile.mkdtemp(dir=path)
+        try:
+            extract_members(other, {e.member for _, e in moved}, scratch, jobs)
+            for name, entry in moved:
+                target: str = os.path.join(path, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(os.path.join(scratch, entry.member), target)
+        finally:
+            shutil.rmtree(scratch)
+    for entries in groups.values():
+        for name, entry in entries:
+            os.utime(os.path.join(path, name), ns=(entry.mtime_ns, entry.mtime_ns))
+    extract_members(archive, None, path, jobs)
+
+
+def get_archive_suffix(name: str) -> Optional[str]:
+    """Will return the suffix of a tarball compressed with a known codec.
+
+    Args:
+        name (string): The file's name.
+
+    Returns:
+        string: The suffix, such as .tar.xz, or None if it is not a tarball.
+    """
+    for codec in CODECS.values():
+        if name.endswith(f".tar{codec.suffix}"):
+            return f".tar{codec.suffix}"
+    return None
+
+
+def compress_folder(
+    directory: str,
+    name: str,
+    jobs: int = 1,
+    level: Optional[int] = None,
+    index: bool = True,
+    codec: str = "xz",
+    speed: float = 20.0,
+    ratio: Optional[float] = None,
+    manifest: bool = False,
+    base: Optional[str] = None,
+) -> str:
+    """Compresses a folder to a tarball, as a .tar.xz by default.
+
+    Each block is compressed on its own, so members that are already
+    compressed get blocks of their own at the codec's cheapest level.
+
+    With a base archive only files that changed since are archived, and
+    the manifest refers to the archive that already holds the rest. A
+    file is unchanged if its size and mtime match, or else if its hash
+    matches any file in the base, which also catches moves and copies.
+    Incremental archives are named with the time they were taken.
 
     Args:
         directory (string): The directory of the folder to compress.
         name (string): The name of the folder to compress.
+        jobs (integer): The number of threads compressing at once.
+        level (integer): The level, or None for the codec's default.
+        index (boolean): Whether to save the index for random access.
+        codec (string): The codec's name, or auto to pick one from a sample.
+        speed (float): With auto, the target speed of one thread in MB/s.
+        ratio (float): With auto, the target compression ratio, if any.
+        manifest (boolean): Whether to save a manifest to base later ones on.
+        base (string): The archive to base an incremental one on, if any.
+
+    Returns:
+        string: The tarball's name.
 
     """
     os.chdir(directory)
-    with tarfile.open(f"{name}.tar.xz", "w:xz", preset=PRESET_EXTREME) as tar:  # type: ignore
-        tar.add(name)
+    chosen: Codec
+    if codec == "auto":
+        chosen, level = choose_codec(name, speed, ratio)
+    else:
+        chosen = CODECS[codec]
+    level = chosen.default if level is None else level
+    archive: str = f"{name}.tar{chosen.suffix}"
+    known: dict[str, ManifestEntry] = {}
+    if base is not None:
+        archive = f"{name}.{time.strftime('%Y%m%dT%H%M%S')}.tar{chosen.suffix}"
+        previous: Optional[Manifest] = read_manifest(base)
+        if previous is None:
+            raise FileNotFoundError(f"{base} has no manifest")
+        known = {
+            path: entry._replace(
+                archive=os.path.relpath(
+                    os.path.join(os.path.dirname(base), entry.archive)
+                )
+            )
+            for path, entry in previous.files.items()
+        }
+    by_hash: dict[str, ManifestEntry] = {e.sha256: e for e in known.values()}
+    files: dict[str, ManifestEntry] = {}
+
+    def pick(info: tarfile.TarInfo) -> bool:
+        if info.isreg() and (manifest or base is not None):
+            mtime_ns: int = os.stat(info.name).st_mtime_ns
+            old: Optional[ManifestEntry] = known.get(info.name)
+            if old is not None and (old.size, old.mtime_ns) == (info.size, mtime_ns):
+                files[info.name] = old
+                return False
+            digest: str = hash_file(info.name)
+            old = by_hash.get(digest)
+            if old is not None and old.size == info.size:
+                files[info.name] = old._replace(mtime_ns=mtime_ns)
+                return False
+            files[info.name] = ManifestEntry(
+                info.size, mtime_ns, digest, archive, info.name
+            )
+        compressed: bool = info.size >= STORE_MIN_SIZE and is_compressed(info.name)
+        writer.set_level(chosen.store if compressed else level)
+        return True
 
+    with open(archive, "wb") as out, ParallelWriter(out, jobs, chosen, level) as writer:
+        with tarfile.open(fileobj=writer, mode="w") as tar:
+            members: list[Member] = add_indexed(tar, name, pick)
+    if manifest or base is not None:
+        write_manifest(archive, Manifest(base and os.path.relpath(base), files))
+    if index:
+        write_index(
+            archive, ArchiveIndex(os.path.getsize(archive), writer.blocks, members)
+        )
+    return archive
 
-def decompress_tar(directory: str, name: str) -> None:
-    """Decompresses a .tar.xz to a folder.
+
+def decompress_tar(directory: str, name: str, jobs: int = 1) -> None:
+    """Decompresses a tarball to a folder.
 
     Args:
-        directory (string): The directory of the .tar.xz to expand.
-        name (string): The name of the .tar.xz to expand.
+        directory (string): The directory of the tarball to expand.
+        name (string): The name of the tarball, .tar.xz if it has no suffix.
+            A tarball with a manifest is restored with what it refers to.
+        jobs (integer): The number of threads extracting blocks at once.
 
     """
-    name = name.replace(".tar.xz", "")
+    archive: str = name if get_archive_suffix(name) else f"{name}.tar.xz"
 
     os.chdir(directory)
-    with tarfile.open(f"{name}.tar.xz", "r:xz") as tar:
-        tar.extractall(".")
+    if os.path.exists(f"{archive}{MANIFEST_SUFFIX}"):
+        restore(archive, ".", jobs)
+        return
+    if jobs > 1:
+        extract_members(archive, jobs=jobs)
+        return
+    with BlockReader(
+        archive, [(0, 0, os.path.getsize(archive))], detect_codec(archive)
+    ) as reader:
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            tar.extractall(".")
 
 
 if __name__ == "__main__":
-    args: list[str] = sys.argv[1:]
-    if len(args) != 0:
-        path: str = args[0]
-    else:
-        raise Exception("NOENT")
+    PARSER = argparse.ArgumentParser(
+        description="Compresses a folder, or expands a tarball."
+    )
+    PARSER.add_argument("path", metavar="path", help="The folder or tarball")
+    PARSER.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="jobs",
+        help="Compress or extract this many independent blocks at once",
+    )
+    PARSER.add_argument(
+        "-c",
+        "--codec",
+        choices=(*CODECS, "auto"),
+        default="xz",
+        help="The codec, or auto to pick one by compressing a sample",
+    )
+    PARSER.add_argument(
+        "-p",
+        "--preset",
+        metavar="preset",
+        help="The level, such as 6 or for xz 9e; xz defaults to 0e; not with auto",
+    )
+    PARSER.add_argument(
+        "--speed",
+        type=float,
+        default=20.0,
+        metavar="MB/s",
+        help="With auto, the best ratio that compresses this fast per thread",
+    )
+    PARSER.add_argument(
+        "--ratio",
+        type=float,
+        metavar="ratio",
+        help="With auto, the fastest level that reaches this ratio instead",
+    )
+    PARSER.add_argument(
+        "-m",
+        "--member",
+        action="append",
+        metavar="member",
+        help="Extract only this member, using the index; may be repeated",
+    )
+    PARSER.add_argument(
+        "--manifest",
+        action="store_true",
+        help="Save a manifest of hashes, so later archives can be incremental",
+    )
+    PARSER.add_argument(
+        "-b",
+        "--base",
+        metavar="archive",
+        help="Only archive what changed since this archive, which has a manifest",
+    )
+    PARSER.add_argument(
+        "--no-index",
+        dest="index",
+        action="store_false",
+        help="Do not save the index for random access beside the archive",
+    )
+    ARGS: argparse.Namespace = PARSER.parse_args()
+    path: str = ARGS.path
+    if ARGS.codec == "auto" and ARGS.preset is not None:
+        PARSER.error(
+            "-c auto picks its own level, so it can not be used with -p/--preset"
+        )
+    try:
+        LEVEL: Optional[int] = (
+            None
+            if ARGS.codec == "auto"
+            else parse_level(CODECS[ARGS.codec], ARGS.preset)
+        )
+    except argparse.ArgumentTypeError as err:
+        PARSER.error(f"argument -p/--preset: {err}")
 
     base_dir: str = os.path.dirname(path)
     base_name: str = os.path.basename(path)
 
     if os.path.isdir(path):
-        compress_folder(base_dir, base_name)
+        compress_folder(
+            base_dir,
+            base_name,
+            ARGS.jobs,
+            LEVEL,
+            ARGS.index,
+            ARGS.codec,
+            ARGS.speed,
+            ARGS.ratio,
+            ARGS.manifest,
+            ARGS.base and os.path.abspath(ARGS.base),
+        )
 
-    if os.path.isfile(path) and path.endswith(".tar.xz"):
-        decompress_tar(base_dir, base_name)
+    if os.path.isfile(path) and get_archive_suffix(path):
+        if ARGS.member:
+            try:
+                extract_members(path, ARGS.member, base_dir or ".", ARGS.jobs)
+            except KeyError as err:
+                PARSER.error(f"argument -m/--member: {err.args[0]}")
+        else:
+            decompress_tar(base_dir, base_name, ARGS.jobs)
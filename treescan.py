@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+@file      treescan.py
+@brief     Lists directory trees with as few system calls as possible.
+
+@author    Evan Elias Young
+@date      2026-10-18
+@date      2026-10-18
+@copyright Copyright 2026 Evan Elias Young. All rights reserved.
+"""
+
+import os
+import stat
+from heapq import heappush, heappushpop
+from concurrent.futures import Executor, Future
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from threading import RLock
+from types import TracebackType
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Sequence
+
+
+class Entry(NamedTuple):
+    """One directory entry, with its stat fields when they were read."""
+
+    name: str
+    path: str
+    is_dir: bool
+    is_file: bool
+    is_link: bool
+    mode: int = 0
+    size: int = 0
+    mtime_ns: int = 0
+    inode: int = 0
+
+
+def stat_entry(path: str) -> Entry:
+    """Will stat a single path into an entry, following symlinks.
+
+    Only symlinks cost a second stat call, to read their target.
+
+    Args:
+        path (string): The path.
+
+    Returns:
+        Entry: The path's entry.
+    """
+    info: os.stat_result = os.lstat(path)
+    is_link: bool = stat.S_ISLNK(info.st_mode)
+    if is_link:
+        info = os.stat(path)
+    return Entry(
+        os.path.basename(path),
+        path,
+        stat.S_ISDIR(info.st_mode),
+        stat.S_ISREG(info.st_mode),
+        is_link,
+        info.st_mode,
+        info.st_size,
+        info.st_mtime_ns,
+        info.st_ino,
+    )
+
+
+def scan(path: str, stat_dirs: bool = True, stat_files: bool = True) -> list[Entry]:
+    """Will list a directory, reading each entry's type and stat only once.
+
+    The type comes from the directory listing itself where the platform
+    provides it, so an entry costs at most one stat call, and none at all
+    when its stat fields are not wanted.
+
+    Args:
+        path (string): The directory's path.
+        stat_dirs (boolean): Whether to read the stat of directories.
+        stat_files (boolean): Whether to read the stat of everything else.
+
+    Returns:
+        list: The directory's entries, in listing order.
+    """
+    ret: list[Entry] = []
+    with os.scandir(path) as items:
+        for item in items:
+            is_dir: bool = item.is_dir()
+            is_file: bool = not is_dir and item.is_file()
+            if not (stat_dirs if is_dir else stat_files) or not (is_dir or is_file):
+                ret.append(
+                    Entry(item.name, item.path, is_dir, is_file, item.is_symlink())
+                )
+                continue
+            info: os.stat_result = item.stat()
+            ret.append(
+                Entry(
+                    item.name,
+                    item.path,
+                    is_dir,
+                    is_file,
+                    item.is_symlink(),
+                    info.st_mode,
+                    info.st_size,
+                    info.st_mtime_ns,
+                    info.st_ino,
+                )
+            )
+    return ret
+
+
+class Scanner:
+    """Lists directories, optionally ahead of time on a pool of workers.
+
+    Callers say which directories they will want next with prefetch, and
+    those are listed in the background. While a listing waits to be used,
+    its own subdirectories are listed too, up to limit listings ahead, so
+    the workers stay busy even on deep trees. read_ahead may turn down the
+    subdirectories the caller will never list, so none are wasted. scan
+    still hands listings back one at a time in the caller's own order, so
+    output stays deterministic whatever the number of workers.
+    """
+
+    def __init__(
+        self,
+        jobs: int = 1,
+        processes: bool = False,
+        stat_dirs: bool = True,
+        stat_files: bool = True,
+        window: Optional[int] = None,
+        limit: Optional[int] = None,
+        read_ahead: Optional[Callable[[Entry], bool]] = None,
+    ) -> None:
+        self.stat_dirs: bool = stat_dirs
+        self.stat_files: bool = stat_files
+        self.window: int = window if window is not None else 4 * jobs
+        self.limit: int = limit if limit is not None else 64 * jobs
+        self.read_ahead: Optional[Callable[[Entry], bool]] = read_ahead
+        self._lock: RLock = RLock()
+        self._pool: Optional[Executor] = None
+        if jobs > 1:
+            self._pool = (
+                ProcessPoolExecutor(jobs) if processes else ThreadPoolExecutor(jobs)
+            )
+        self._pending: dict[str, Future[list[Entry]]] = {}
+
+    def __enter__(self) -> "Scanner":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc: Optional[BaseException],
+        trace: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        """Will start listing directories that will be scanned soon.
+
+        Args:
+            paths (iterable): The directories' paths.
+        """
+        with self._lock:
+            for path in paths:
+                self._submit(path)
+
+    def _submit(self, path: str) -> None:
+        """Will start listing a directory if it is not already pending.
+
+        Args:
+            path (string): The directory's path.
+        """
+        if self._pool is None or path in self._pending:
+            return
+        pending: Future[list[Entry]] = self._pool.submit(
+            scan, path, self.stat_dirs, self.stat_files
+        )
+        self._pending[path] = pending
+        pending.add_done_callback(lambda done: self._read_ahead(path, done))
+
+    def _read_ahead(self, path: str, done: "Future[list[Entry]]") -> None:
+        """Will start listing the subdirectories of a finished listing.
+
+        Only listings nobody has taken yet read ahead, so a directory the
+        caller already scanned is never listed a second time.
+
+        Args:
+            path (string): The listed directory's path.
+            done (Future): The finished listing.
+        """
+        if done.cancelled() or done.exception() is not None:
+            return
+        with self._lock:
+            if self._pending.get(path) is not done:
+                return
+            for entry in done.result():
+                if len(self._pending) >= self.limit:
+                    break
+                if (
+                    entry.is_dir
+                    and not entry.is_link
+                    and (self.read_ahead is None or self.read_ahead(entry))
+                ):
+                    self._submit(entry.path)
+
+    def scan(self, path: str) -> list[Entry]:
+        """Will list a directory, waiting for its prefetch if there is one.
+
+        Args:
+            path (string): The directory's path.
+
+        Returns:
+            list: The directory's entries, in listing order.
+        """
+        with self._lock:
+            pending: Optional[Future[list[Entry]]] = self._pending.pop(path, None)
+        if pending is not None:
+            return pending.result()
+        return scan(path, self.stat_dirs, self.stat_files)
+
+    def close(self) -> None:
+        """Will stop the workers and drop any unused listings."""
+        with self._lock:
+            pool: Optional[Executor] = self._pool
+            self._pool = None
+            for pending in self._pending.values():
+                pending.cancel()
+            self._pending.clear()
+        if pool is not None:
+            pool.shutdown()
+
+
+def walk(
+    top: str,
+    stat_dirs: bool = False,
+    stat_files: bool = False,
+    followlinks: bool = False,
+    jobs: int = 1,
+    processes: bool = False,
+) -> Iterator[tuple[str, int, list[Entry], list[Entry]]]:
+    """Will walk a tree top down, in the same order as os.walk.
+
+    Like os.walk, directories that can not be listed are skipped, and the
+    caller may remove entries from the yielded dirs to prune the walk.
+    With more than one job, the next directories on the stack are listed
+    in the background while the caller handles the current one.
+
+    Args:
+        top (string): The starting path.
+        stat_dirs (boolean): Whether to read the stat of directories.
+        stat_files (boolean): Whether to read the stat of files.
+        followlinks (boolean): Whether to walk into symlinked directories.
+        jobs (integer): The number of workers listing directories.
+        processes (boolean): Whether the workers are processes, not threads.
+
+    Yields:
+        tuple: The directory's path, depth, subdirectories, and files.
+    """
+    stack: list[tuple[str, int]] = [(top, 0)]
+    with Scanner(jobs, processes, stat_dirs, stat_files) as scanner:
+        while stack:
+            root, depth = stack.pop()
+            try:
+                entries: list[Entry] = scanner.scan(root)
+            except OSError:
+                continue
+            dirs: list[Entry] = [e for e in entries if e.is_dir]
+            files: list[Entry] = [e for e in entries if not e.is_dir]
+            yield (root, depth, dirs, files)
+            stack.extend(
+                [
+                    (e.path, depth + 1)
+                    for e in reversed(dirs)
+                    if followlinks or not e.is_link
+                ]
+            )
+            scanner.prefetch(
+                [path for path, _ in islice(reversed(stack), scanner.window)]
+            )
+
+
+class Usage(NamedTuple):
+    """The totals of one directory and everything below it."""
+
+    path: str
+    depth: int
+    size: int
+    files: int
+
+
+class DiskUsage:
+    """Totals up a walk as it goes, like du, in the same single pass.
+
+    Directories must be added in walk order. A directory is finished once
+    the walk moves to one that is not below it, and its totals are then
+    rolled into its parent's, so only the current branch is held open.
+    The largest files and directories are kept in heaps of at most top
+    items, so memory does not grow with the size of the tree.
+    """
+
+    def __init__(self, top: int = 10) -> None:
+        self.top: int = top
+        self._open: list[Usage] = []
+        self._files: list[tuple[int, str]] = []
+        self._dirs: list[tuple[int, str]] = []
+
+    @staticmethod
+    def _keep(heap: list[tuple[int, str]], item: tuple[int, str], top: int) -> None:
+        """Will add an item to a heap, dropping the smallest past top items.
+
+        Args:
+            heap (list): The min-heap.
+            item (tuple): The size and path.
+            top (integer): The most items to keep.
+        """
+        if len(heap) < top:
+            heappush(heap, item)
+        elif top > 0 and item > heap[0]:
+            heappushpop(heap, item)
+
+    def _close(self, depth: int) -> list[Usage]:
+        """Will finish every open directory at or below a depth.
+
+        Args:
+            depth (integer): The shallowest depth to finish.
+
+        Returns:
+            list: The finished directories, children before parents.
+        """
+        ret: list[Usage] = []
+        while self._open and self._open[-1].depth >= depth:
+            done: Usage = self._open.pop()
+            ret.append(done)
+            self._keep(self._dirs, (done.size, done.path), self.top)
+            if self._open:
+                parent: Usage = self._open[-1]
+                self._open[-1] = parent._replace(
+                    size=parent.size + done.size, files=parent.files + done.files
+                )
+        return ret
+
+    def add(self, root: str, depth: int, files: Sequence[Entry]) -> list[Usage]:
+        """Will add a directory's own files to the totals.
+
+        Symlinks are listed but not counted, as du does.
+
+        Args:
+            root (string): The directory's path.
+            depth (integer): The directory's depth in the walk.
+            files (sequence): The directory's files, with their stats.
+
+        Returns:
+            list: The directories this one finished, children before parents.
+        """
+        ret: list[Usage] = self._close(depth)
+        size: int = 0
+        count: int = 0
+        for entry in files:
+            if entry.is_link:
+                continue
+            size += entry.size
+            count += 1
+            self._keep(self._files, (entry.size, entry.path), self.top)
+        self._open.append(Usage(root, depth, size, count))
+        return ret
+
+    def finish(self) -> list[Usage]:
+        """Will finish every directory still open once the walk is done.
+
+        Returns:
+            list: The finished directories, children before parents.
+        """
+        return self._close(0)
+
+    def largest_files(self) -> list[tuple[int, str]]:
+        """Will return the largest files seen.
+
+        Returns:
+            list: Up to top sizes and paths, largest first.
+        """
+        return sorted(self._files, reverse=True)
+
+    def largest_dirs(self) -> list[tuple[int, str]]:
+        """Will return the largest finished directories, with their subtrees.
+
+        Returns:
+            list: Up to top sizes and paths, largest first.
+        """
+        return sorted(self._dirs, reverse=True)
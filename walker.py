@@ -12,6 +12,8 @@
 import os
 import argparse
 
+from treescan import DiskUsage, Entry, walk
+
 PARSER = argparse.ArgumentParser(description="Process some integers.")
 PARSER.add_argument("path", metavar="path", help="The starting path")
 PARSER.add_argument(
@@ -20,39 +22,108 @@
     metavar="separator",
     help="The string to prepend on directories",
 )
+PARSER.add_argument(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    metavar="jobs",
+    help="List this many directories at once, for high latency storage",
+)
+PARSER.add_argument(
+    "--processes",
+    action="store_true",
+    help="Use worker processes instead of threads for --jobs",
+)
+MODE = PARSER.add_mutually_exclusive_group()
+MODE.add_argument(
+    "--summary",
+    action="store_true",
+    help="List each directory's file count and size instead of its files",
+)
+MODE.add_argument(
+    "--du",
+    action="store_true",
+    help="List each directory's total size, then the largest dirs and files",
+)
+PARSER.add_argument(
+    "--top",
+    type=int,
+    default=10,
+    metavar="count",
+    help="How many of the largest directories and files --du reports",
+)
 ARGS: argparse.Namespace = PARSER.parse_args()
 ARGS.path = ARGS.path[:-1] if ARGS.path.endswith("/") else ARGS.path
 
 
-def get_dir_level(pth: str) -> int:
-    """Will return the directory level of a path.
+class Prefixes:
+    """Hands out the indentation for each level, building each one once."""
 
-    Args:
-        pth (string): The file's path.
+    def __init__(self, sep: str) -> None:
+        self.sep: str = sep
+        self._cache: list[str] = [""]
 
-    Returns:
-        integer: The depth level of the file.
+    def __getitem__(self, lvl: int) -> str:
+        """Will return the prefix for a level.
 
-    """
-    return len(pth.split(os.path.sep))
+        Args:
+            lvl (integer): The level.
 
+        Returns:
+            string: The separator repeated lvl times.
+        """
+        while len(self._cache) <= lvl:
+            self._cache.append(self._cache[-1] + self.sep)
+        return self._cache[lvl]
 
-OUT = open(
-    os.path.join(
-        os.path.dirname(os.path.realpath(__file__)),
-        f"{os.path.basename(ARGS.path)}.txt",
-    ),
-    "w",
-    encoding="utf-8",
-    newline="\n",
-)
 
-OUT.write(f"Summary of {ARGS.path}/\n")
-lvloff: int = get_dir_level(ARGS.path) - 1
-for (root, dirs, fils) in os.walk(ARGS.path):
-    lvl: int = get_dir_level(root) - lvloff
-    OUT.write(f"{(lvl - 1) * ARGS.s}{root.split(os.path.sep)[-1]}\n")
-    for f in fils:
-        OUT.write(f"{lvl * ARGS.s}{f}\n")
+if __name__ == "__main__":
+    PREFIX: Prefixes = Prefixes(ARGS.s)
+    with open(
+        os.path.join(
+            os.path.dirname(os.path.realpath(__file__)),
+            f"{os.path.basename(ARGS.path)}.txt",
+        ),
+        "w",
+        buffering=1 << 20,
+        encoding="utf-8",
+        newline="\n",
+    ) as OUT:
+        OUT.write(f"Summary of {ARGS.path}/\n")
+        USAGE: DiskUsage = DiskUsage(ARGS.top)
+        for root, depth, _dirs, fils in walk(
+            ARGS.path,
+            stat_files=ARGS.summary or ARGS.du,
+            jobs=ARGS.jobs,
+            processes=ARGS.processes,
+        ):
+            if ARGS.du:
+                OUT.write(
+                    "".join(
+                        [
+                            f"{u.size}\t{u.files}\t{u.path}\n"
+                            for u in USAGE.add(root, depth, fils)
+                        ]
+                    )
+                )
+                continue
+            name: str = root.rsplit(os.path.sep, 1)[-1]
+            if ARGS.summary:
+                # Symlinks are not counted, as --du does not count them.
+                own: list[Entry] = [f for f in fils if not f.is_link]
+                size: int = sum(f.size for f in own)
+                OUT.write(f"{PREFIX[depth]}{name} ({len(own)} files, {size} bytes)\n")
+                continue
+            pre: str = PREFIX[depth + 1]
+            OUT.write(f"{PREFIX[depth]}{name}\n")
+            OUT.write("".join([f"{pre}{f.name}\n" for f in fils]))
 
-OUT.close()
+        if ARGS.du:
+            OUT.write(
+                "".join([f"{u.size}\t{u.files}\t{u.path}\n" for u in USAGE.finish()])
+            )
+            OUT.write("\nLargest directories:\n")
+            OUT.write("".join([f"{sz}\t{p}\n" for sz, p in USAGE.largest_dirs()]))
+            OUT.write("\nLargest files:\n")
+            OUT.write("".join([f"{sz}\t{p}\n" for sz, p in USAGE.largest_files()]))